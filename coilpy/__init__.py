@@ -15,15 +15,18 @@ from .misc import colorbar, get_figure, kwargs2dict, map_matrix
 from .misc import print_progress, toroidal_period, vmecMN, xy2rp
 from .misc import trigfft, fft_deriv, trig2real, vmec2focus
 from .misc import real2trig_2d, booz2focus, read_focus_boundary, div0
-from .misc import biot_savart, rotation_matrix
+from .misc import biot_savart, biot_savart_coils, vector_potential_coils
+from .misc import rotation_matrix
+from .misc import set_backend, get_backend, available_backends, check_backends
 from .hdf5 import HDF5
 from .surface import FourSurf
 from .dipole import Dipole
 from .focushdf5 import FOCUSHDF5
-from .coils import Coil, SingleCoil
+from .coils import Coil, SingleCoil, SymmetricCoil
 from .stellopt import STELLout
 from .vmec import VMECout
 from .booz_xform import BOOZ_XFORM
 from .mgrid import Mgrid
+from .poincare import Poincare
 
 # from coilpy_fortran import hanson_hirshman, biot_savart
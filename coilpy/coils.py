@@ -32,25 +32,72 @@ class SingleCoil(object):
         self.zt = None
         return
 
-    def bfield(self, pos):
-        """Calculate the magnetic field at an arbitrary point using `self.dt`.
+    def bfield(self, pos, chunk=1024, nthreads=1, backend=None):
+        """Calculate the magnetic field at arbitrary points using `self.dt`.
+
+        Points are evaluated in blocks of `chunk`, so the scratch memory is
+        bounded by (chunk, nseg) arrays regardless of the number of points.
 
         Args:
-            pos (list): Evaluation point in Cartesian coordinates.
+            pos (array_like, (3,) or (n,3)): Evaluation point(s) in Cartesian coordinates.
+            chunk (int, optional): Number of points evaluated per block. Defaults to 1024.
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
 
         Returns:
-            numpy.ndarray: B vector produced by the coil.
+            numpy.ndarray, (3,) or (n,3): B vector(s) produced by the coil.
         """
-        ob_pos = np.atleast_1d(pos)
-        dx = ob_pos[0] - self.x[:-1]
-        dy = ob_pos[1] - self.y[:-1]
-        dz = ob_pos[2] - self.z[:-1]
-        dr = dx * dx + dy * dy + dz * dz
-        Bx = (dz * self.yt[:-1] - dy * self.zt[:-1]) * np.power(dr, -1.5) * self.dt
-        By = (dx * self.zt[:-1] - dz * self.xt[:-1]) * np.power(dr, -1.5) * self.dt
-        Bz = (dy * self.xt[:-1] - dx * self.yt[:-1]) * np.power(dr, -1.5) * self.dt
-        B = np.array([np.sum(Bx), np.sum(By), np.sum(Bz)]) * u0_d_4pi * self.I
-        return B
+        from .misc import get_backend, _blocks
+
+        ob_pos = np.asarray(pos, dtype=float)
+        single = ob_pos.ndim == 1
+        ob_pos = np.atleast_2d(ob_pos)
+        assert ob_pos.shape[1] == 3, "pos should be in the shape of (n,3)"
+        assert chunk > 0
+        kernels = get_backend(backend)
+        if kernels["name"] != "numpy":
+            xyz = np.transpose([self.x[:-1], self.y[:-1], self.z[:-1]])
+            dxyz = np.transpose([self.xt[:-1], self.yt[:-1], self.zt[:-1]]) * self.dt
+            kernel = kernels["biot_savart"]
+            B = _blocks(
+                lambda p: kernel(p, xyz, self.I, dxyz, nthreads=nthreads), ob_pos, chunk
+            )
+            return B[0] if single else B
+        npos = len(ob_pos)
+        x, y, z = self.x[:-1], self.y[:-1], self.z[:-1]
+        xt, yt, zt = self.xt[:-1], self.yt[:-1], self.zt[:-1]
+        # scratch buffers reused by every block
+        nbuf = min(chunk, npos)
+        shape = (nbuf, len(x))
+        dx, dy, dz = np.empty(shape), np.empty(shape), np.empty(shape)
+        dr, tmp, bb = np.empty(shape), np.empty(shape), np.empty(shape)
+        B = np.empty((npos, 3))
+        for start in range(0, npos, chunk):
+            end = min(start + chunk, npos)
+            n = end - start
+            _dx, _dy, _dz = dx[:n], dy[:n], dz[:n]
+            _dr, _tmp, _bb = dr[:n], tmp[:n], bb[:n]
+            np.subtract(ob_pos[start:end, 0:1], x, out=_dx)
+            np.subtract(ob_pos[start:end, 1:2], y, out=_dy)
+            np.subtract(ob_pos[start:end, 2:3], z, out=_dz)
+            # dr**(-1.5) is kept in _dr
+            np.multiply(_dx, _dx, out=_dr)
+            np.multiply(_dy, _dy, out=_tmp)
+            np.add(_dr, _tmp, out=_dr)
+            np.multiply(_dz, _dz, out=_tmp)
+            np.add(_dr, _tmp, out=_dr)
+            np.power(_dr, -1.5, out=_dr)
+            for i, (a, at, b, bt) in enumerate(
+                ((_dz, yt, _dy, zt), (_dx, zt, _dz, xt), (_dy, xt, _dx, yt))
+            ):
+                np.multiply(a, at, out=_bb)
+                np.multiply(b, bt, out=_tmp)
+                np.subtract(_bb, _tmp, out=_bb)
+                np.multiply(_bb, _dr, out=_bb)
+                np.multiply(_bb, self.dt, out=_bb)
+                np.sum(_bb, axis=1, out=B[start:end, i])
+        B = B * u0_d_4pi * self.I
+        return B[0] if single else B
 
     def bfield_fd(self, pos):
         """Calculate the magnetic field at an arbitrary point using finite difference.
@@ -75,18 +122,34 @@ class SingleCoil(object):
         B = np.array([np.sum(Bx), np.sum(By), np.sum(Bz)]) * u0_d_4pi * self.I
         return B
 
-    def bfield_HH(self, pos, **kwargs):
+    def bfield_HH(self, pos, gradient=False, nthreads=1, backend=None, **kwargs):
         """Calculate B field at an arbitrary point using the Hanson-Hirshman expression
 
         Arguments:
             pos (list): Cartesian coordinates for the evaluation point.
+            gradient (bool, optional): Also return the gradient dB_i/dx_j, (n,3,3),
+                computed in the same pass. It always uses NumPy. Defaults to False.
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
 
         Returns:
             numpy.ndarray: B vector produced by the coil.
         """
+        from .misc import get_backend
+
         xyz = np.array([self.x, self.y, self.z]).T
         pos = np.atleast_2d(pos)
         assert (pos.shape)[1] == 3
+        if gradient:
+            from .misc import _hanson_hirshman_segments
+
+            return _hanson_hirshman_segments(
+                pos, xyz[:-1], xyz[1:], self.I, gradient=True
+            )
+        kernels = get_backend(backend)
+        if kernels["name"] != "numpy":
+            pos = np.asarray(pos, dtype=float)
+            return kernels["hanson_hirshman"](pos, xyz, self.I, nthreads=nthreads)
         Rvec = pos[:, np.newaxis, :] - xyz[np.newaxis, :, :]
         assert (Rvec.shape)[-1] == 3
         RR = np.linalg.norm(Rvec, axis=2)
@@ -107,26 +170,58 @@ class SingleCoil(object):
         )
         return B
 
-    def hanson_hirshman(self, pos):
+    def hanson_hirshman(self, pos, nthreads=1, backend=None):
         """Wrapper for the fortran code biotsavart.hanson_hirshman
 
         Args:
             pos (ndarray, (n,3)): Evaluation points in space
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
 
         Returns:
             ndarray, (n,3): Magnetic field at the evaluation point
         """
-        from coilpy_fortran import hanson_hirshman
+        from .misc import biot_savart
 
         xyz = np.transpose([self.x, self.y, self.z])
-        return hanson_hirshman(pos, xyz, self.I)
+        return biot_savart(pos, xyz, self.I, nthreads=nthreads, backend=backend)
 
-    def biot_savart(self, pos):
-        from coilpy_fortran import biot_savart
+    def biot_savart(self, pos, nthreads=1, backend=None):
+        """Wrapper for the fortran code biotsavart.biot_savart
+
+        Args:
+            pos (ndarray, (n,3)): Evaluation points in space
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+
+        Returns:
+            ndarray, (n,3): Magnetic field at the evaluation point
+        """
+        from .misc import biot_savart
 
         xyz = np.transpose([self.x, self.y, self.z])
         dxyz = np.transpose([self.xt * self.dt, self.yt * self.dt, self.zt * self.dt])
-        return biot_savart(pos, xyz[:-1, :], self.I, dxyz[:-1, :])
+        return biot_savart(
+            pos, xyz[:-1, :], self.I, dxyz[:-1, :], nthreads=nthreads, backend=backend
+        )
+
+    def vector_potential(self, pos, nthreads=1, backend=None):
+        """Calculate the vector potential of the coil made of straight segments.
+
+        Args:
+            pos (ndarray, (n,3)): Evaluation points in space
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+
+        Returns:
+            ndarray, (n,3): Vector potential at the evaluation point
+        """
+        from .misc import vector_potential_coils
+
+        xyz = np.transpose([self.x, self.y, self.z])
+        return vector_potential_coils(
+            pos, xyz, [0, len(xyz)], [self.I], nthreads=nthreads, backend=backend
+        )
 
     def fourier_tangent(self):
         """
@@ -164,16 +259,14 @@ class SingleCoil(object):
         theta = np.linspace(0, 1, num=cur_len, endpoint=True)
         theta_new = np.linspace(0, 1, num=num, endpoint=True)
         if kind == "fft":
-            # FFT
-            fftxy = trigfft(self.x[:-1] + 1j * self.y[:-1], tr=nf)
-            fftz = trigfft(self.z[:-1], tr=nf)
-            xm = fftxy["n"]
-            xc = fftxy["rcos"]
-            xs = fftxy["rsin"]
-            yc = fftxy["icos"]
-            ys = fftxy["isin"]
-            zc = fftz["rcos"]
-            zs = fftz["rsin"]
+            # FFT of x+iy and z together, the series are periodic in 2*pi
+            theta_new = 2 * np.pi * theta_new
+            fft = trigfft([self.x[:-1] + 1j * self.y[:-1], self.z[:-1]], tr=nf)
+            xm = fft["n"]
+            xc, zc = fft["rcos"]
+            xs, zs = fft["rsin"]
+            yc = fft["icos"][0]
+            ys = fft["isin"][0]
             self.x = trig2real(theta_new, zeta=None, xm=xm, xn=None, fmnc=xc, fmns=xs)
             self.y = trig2real(theta_new, zeta=None, xm=xm, xn=None, fmnc=yc, fmns=ys)
             self.z = trig2real(theta_new, zeta=None, xm=xm, xn=None, fmnc=zc, fmns=zs)
@@ -523,6 +616,8 @@ class Coil(object):
                 )
             )
         self.index = 0
+        # cached response matrix, see self.response_matrix
+        self._response = None
         return
 
     def __iter__(self):
@@ -557,11 +652,17 @@ class Coil(object):
         return total
 
     @classmethod
-    def read_makegrid(cls, filename):
+    def read_makegrid(cls, filename, mmap=False):
         """Read coils from the MAKEGRID format.
 
+        The file is split on the coil-ending lines (more than four columns) and the
+        points of each coil are parsed at once by `np.fromstring`.
+        Reading stops at the first line with less than four columns (e.g. "end").
+
         Args:
             filename (str): file path and name
+            mmap (bool, optional): Memory-map the file instead of reading it.
+                Defaults to False.
 
         Raises:
             IOError: Check if file exists
@@ -575,49 +676,59 @@ class Coil(object):
         if not os.path.exists(filename):
             raise IOError("File not existed. Please check again!")
         # read and parse data
-        cls.header = ""
-        with open(filename, "r") as coilfile:  # read coil xyz and I
-            cls.header = "".join(
-                (coilfile.readline(), coilfile.readline(), coilfile.readline())
-            )
-            icoil = 0
-            xx = [[]]
-            yy = [[]]
-            zz = [[]]
-            II = []
-            names = []
-            groups = []
-            tmpI = 0.0
-            for line in coilfile:
-                linelist = line.split()
-                if len(linelist) < 4:
-                    # print("End of file or invalid format!")
-                    break
-                xx[icoil].append(float(linelist[0]))
-                yy[icoil].append(float(linelist[1]))
-                zz[icoil].append(float(linelist[2]))
-                if len(linelist) == 4:
-                    tmpI = float(linelist[-1])
-                if len(linelist) > 4:
-                    II.append(tmpI)
-                    try:
-                        group = int(linelist[4])
-                    except ValueError:
-                        group = len(groups) + 1
-                    groups.append(group)
-                    try:
-                        name = linelist[5]
-                    except IndexError:
-                        name = "coil"
-                    names.append(name)
-                    icoil = icoil + 1
-                    xx.append([])
-                    yy.append([])
-                    zz.append([])
-        xx.pop()
-        yy.pop()
-        zz.pop()
-        # print(len(xx) , len(yy) , len(zz) , len(II) , len(names) , len(groups))
+        with open(filename, "rb") as coilfile:  # read coil xyz and I
+            if mmap:
+                import mmap as _mmap
+
+                data = _mmap.mmap(coilfile.fileno(), 0, access=_mmap.ACCESS_READ)
+            else:
+                data = coilfile.read()
+        start = 0
+        for i in range(3):
+            newline = data.find(b"\n", start)
+            start = len(data) if newline < 0 else newline + 1
+        cls.header = data[:start].decode().replace("\r\n", "\n")
+        # count the columns of every line, in windows of whole lines so that the
+        # temporary arrays stay bounded
+        begins, ends, ncol = _line_columns(data, start)
+        # the data end at the first line with less than four columns
+        short = np.flatnonzero(ncol < 4)
+        nline = short[0] if len(short) else len(ncol)
+        # the last point of each coil has the group and name columns
+        markers = np.flatnonzero(ncol[:nline] > 4)
+        xx, yy, zz, II, names, groups = [], [], [], [], [], []
+        tmpI = 0.0
+        first = 0
+        for imark in markers:
+            # parse one coil at a time, so only its text is copied out of the file
+            points = np.fromstring(data[begins[first] : begins[imark]], sep=" ")
+            if len(points) != 4 * (imark - first):
+                raise ValueError(
+                    "Invalid coil data before line {:d}.".format(imark + 4)
+                )
+            points = points.reshape((-1, 4))
+            linelist = data[begins[imark] : ends[imark]].split()
+            if len(points):
+                tmpI = points[-1, 3]
+            II.append(tmpI)
+            last = [float(value) for value in linelist[:3]]
+            xyz = np.concatenate((points[:, :3], [last]))
+            xx.append(xyz[:, 0])
+            yy.append(xyz[:, 1])
+            zz.append(xyz[:, 2])
+            try:
+                group = int(linelist[4])
+            except ValueError:
+                group = len(groups) + 1
+            groups.append(group)
+            try:
+                name = linelist[5].decode()
+            except IndexError:
+                name = "coil"
+            names.append(name)
+            first = imark + 1
+        if mmap:
+            data.close()
         return cls(xx=xx, yy=yy, zz=zz, II=II, names=names, groups=groups)
 
     @classmethod
@@ -647,6 +758,379 @@ class Coil(object):
         groups = range(1, ncoil + 1)
         return cls(xx=xx, yy=yy, zz=zz, II=II, names=names, groups=groups)
 
+    def pack(self):
+        """Pack the points of all coils into one contiguous array.
+
+        Returns:
+            numpy.ndarray, (npts,3): xyz points of all coils, one after another.
+            numpy.ndarray, (ncoil+1,): Offset table, coil i is `xyz[offsets[i]:offsets[i+1]]`.
+            numpy.ndarray, (ncoil,): Coil currents.
+        """
+        lens = [len(icoil.x) for icoil in self.data]
+        offsets = np.concatenate(([0], np.cumsum(lens))).astype(int)
+        xyz = np.empty((offsets[-1], 3))
+        for i, icoil in enumerate(self.data):
+            xyz[offsets[i] : offsets[i + 1], 0] = icoil.x
+            xyz[offsets[i] : offsets[i + 1], 1] = icoil.y
+            xyz[offsets[i] : offsets[i + 1], 2] = icoil.z
+        currents = np.array([icoil.I for icoil in self.data], dtype=float)
+        return xyz, offsets, currents
+
+    @classmethod
+    def unpack(cls, xyz, offsets, currents, names=None, groups=None):
+        """Build a coil set from packed arrays, the inverse of `self.pack`.
+
+        The coordinates of every `SingleCoil` are views into `xyz`, no data is copied.
+
+        Args:
+            xyz (numpy.ndarray, (npts,3)): xyz points of all coils, one after another.
+            offsets (numpy.ndarray, (ncoil+1,)): Offset table, coil i is `xyz[offsets[i]:offsets[i+1]]`.
+            currents (numpy.ndarray, (ncoil,)): Coil currents.
+            names (list, optional): Coil names. Defaults to None ("coil").
+            groups (list, optional): Coil groups. Defaults to None (one group per coil).
+
+        Returns:
+            Coil: Coil object.
+        """
+        ncoil = len(offsets) - 1
+        if names is None:
+            names = ["coil"] * ncoil
+        if groups is None:
+            groups = list(range(1, ncoil + 1))
+        xx, yy, zz = [], [], []
+        for i in range(ncoil):
+            xx.append(xyz[offsets[i] : offsets[i + 1], 0])
+            yy.append(xyz[offsets[i] : offsets[i + 1], 1])
+            zz.append(xyz[offsets[i] : offsets[i + 1], 2])
+        return cls(
+            xx=xx,
+            yy=yy,
+            zz=zz,
+            II=list(np.array(currents, dtype=float)),
+            names=np.asarray(names).tolist(),
+            groups=np.asarray(groups).tolist(),
+        )
+
+    def save_npz(self, filename):
+        """Save the coil set in the uncompressed NumPy format, see `self.load`.
+
+        Args:
+            filename (str): File name and path (".npz" is appended if missing).
+        """
+        xyz, offsets, currents = self.pack()
+        np.savez(
+            filename,
+            xyz=xyz,
+            offsets=offsets,
+            currents=currents,
+            names=np.array([icoil.name for icoil in self.data], dtype=str),
+            groups=np.array([icoil.group for icoil in self.data]),
+        )
+        return
+
+    def save_hdf5(self, filename):
+        """Save the coil set in the HDF5 format, see `self.load`.
+
+        Args:
+            filename (str): File name and path.
+        """
+        import h5py
+
+        xyz, offsets, currents = self.pack()
+        with h5py.File(filename, "w") as f:
+            f.create_dataset("xyz", data=xyz)
+            f.create_dataset("offsets", data=offsets)
+            f.create_dataset("currents", data=currents)
+            f.create_dataset(
+                "names",
+                data=[icoil.name for icoil in self.data],
+                dtype=h5py.string_dtype(),
+            )
+            f.create_dataset("groups", data=[icoil.group for icoil in self.data])
+        return
+
+    @classmethod
+    def load(cls, filename, mmap=True):
+        """Load a coil set saved by `self.save_npz` or `self.save_hdf5`.
+
+        All coils share one (npts,3) buffer and `SingleCoil.x/y/z` are views into it.
+        With `mmap`, the buffer is a read-only memory map of the file, so loading is
+        nearly free and the pages are shared between processes. Use `mmap=False` to
+        modify the coils in place (e.g. `SingleCoil.magnify`).
+
+        Args:
+            filename (str): File name and path.
+            mmap (bool, optional): Memory-map the coordinates. Defaults to True.
+
+        Returns:
+            Coil: Coil object.
+        """
+        with open(filename, "rb") as f:
+            magic = f.read(8)
+        if magic.startswith(b"PK"):
+            from .misc import memmap_npz
+
+            if mmap:
+                data = memmap_npz(filename)
+            else:
+                with np.load(filename) as npz:
+                    data = dict(npz)
+        elif magic == b"\x89HDF\r\n\x1a\n":
+            import h5py
+
+            data = {}
+            with h5py.File(filename, "r") as f:
+                for key in f:
+                    offset = f[key].id.get_offset()
+                    if key == "names":
+                        data[key] = f[key].asstr()[()]
+                    elif mmap and offset is not None and f[key].size > 0:
+                        data[key] = np.memmap(
+                            filename,
+                            dtype=f[key].dtype,
+                            mode="r",
+                            offset=offset,
+                            shape=f[key].shape,
+                        )
+                    else:
+                        data[key] = f[key][()]
+        else:
+            raise ValueError("Unknown file format of {:}.".format(filename))
+        return cls.unpack(
+            data["xyz"], data["offsets"], data["currents"], data["names"], data["groups"]
+        )
+
+    def bfield(self, pos, chunk=None, nthreads=1, backend=None):
+        """Calculate the magnetic field of the whole coil set using the tangents.
+
+        All coils are packed into one segment array and evaluated in a single kernel
+        of the selected backend (see `coilpy.misc.set_backend`).
+        Tangents are computed with `SingleCoil.fourier_tangent` if missing.
+
+        Args:
+            pos (array_like, (3,) or (n,3)): Evaluation point(s) in Cartesian coordinates.
+            chunk (int, optional): Number of points evaluated per block. Defaults to None (automatic).
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+
+        Returns:
+            numpy.ndarray, (3,) or (n,3): B vector(s) produced by all coils.
+        """
+        from .misc import get_backend, _blocks
+
+        pos = np.asarray(pos, dtype=float)
+        ri = []
+        dl = []
+        for icoil in self.data:
+            if icoil.xt is None:
+                icoil.fourier_tangent()
+            ri.append(np.transpose([icoil.x[:-1], icoil.y[:-1], icoil.z[:-1]]))
+            dl.append(
+                np.transpose([icoil.xt[:-1], icoil.yt[:-1], icoil.zt[:-1]])
+                * icoil.dt
+                * icoil.I
+            )
+        ri = np.concatenate(ri)
+        dl = np.concatenate(dl)
+        kernel = get_backend(backend)["biot_savart"]
+        B = _blocks(
+            lambda p: kernel(p, ri, 1.0, dl, nthreads=nthreads),
+            np.atleast_2d(pos),
+            chunk,
+        )
+        return B[0] if pos.ndim == 1 else B
+
+    def bfield_HH(self, pos, chunk=None, nthreads=1, backend=None, gradient=False):
+        """Calculate the magnetic field of the whole coil set using the Hanson-Hirshman expression.
+
+        All coils are packed into one array and evaluated in a single kernel
+        of the selected backend (see `coilpy.misc.set_backend`).
+
+        Args:
+            pos (array_like, (3,) or (n,3)): Evaluation point(s) in Cartesian coordinates.
+            chunk (int, optional): Number of points evaluated per block. Defaults to None (automatic).
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+            gradient (bool, optional): Also return the gradient dB_i/dx_j computed in the
+                same pass. It always uses the NumPy kernel. Defaults to False.
+
+        Returns:
+            numpy.ndarray, (3,) or (n,3): B vector(s) produced by all coils.
+            numpy.ndarray, (3,3) or (n,3,3): Gradient of B, only if `gradient` is True.
+        """
+        from .misc import get_backend, _blocks
+
+        pos = np.asarray(pos, dtype=float)
+        xyz, offsets, currents = self.pack()
+        if gradient:
+            from .misc import _hanson_hirshman_segments, _packed_segments, _threaded
+
+            ri, rf, index = _packed_segments(xyz, offsets)
+            B, dB = _threaded(
+                _hanson_hirshman_segments,
+                np.atleast_2d(pos),
+                nthreads,
+                ri,
+                rf,
+                currents[index],
+                chunk,
+                True,
+            )
+            return (B[0], dB[0]) if pos.ndim == 1 else (B, dB)
+        offsets = offsets.astype(np.int32)
+        kernel = get_backend(backend)["hanson_hirshman_coils"]
+        B = _blocks(
+            lambda p: kernel(p, xyz, offsets, currents, nthreads=nthreads),
+            np.atleast_2d(pos),
+            chunk,
+        )
+        return B[0] if pos.ndim == 1 else B
+
+    def vector_potential(self, pos, chunk=None, nthreads=1, backend=None):
+        """Calculate the vector potential of the whole coil set made of straight segments.
+
+        Args:
+            pos (array_like, (3,) or (n,3)): Evaluation point(s) in Cartesian coordinates.
+            chunk (int, optional): Number of points evaluated per block. Defaults to None (automatic).
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+
+        Returns:
+            numpy.ndarray, (3,) or (n,3): A vector(s) produced by all coils.
+        """
+        from .misc import get_backend, _blocks
+
+        pos = np.asarray(pos, dtype=float)
+        xyz, offsets, currents = self.pack()
+        offsets = offsets.astype(np.int32)
+        kernel = get_backend(backend)["vector_potential_coils"]
+        A = _blocks(
+            lambda p: kernel(p, xyz, offsets, currents, nthreads=nthreads),
+            np.atleast_2d(pos),
+            chunk,
+        )
+        return A[0] if pos.ndim == 1 else A
+
+    def flux(self, curve, **kwargs):
+        """Magnetic flux through a closed loop, as the line integral of the vector potential.
+
+        The loop is taken as straight segments and A is evaluated at their midpoints.
+
+        Args:
+            curve (array_like, (m,3)): Points on the loop. The loop is closed automatically
+                if the last point differs from the first one.
+            kwargs: Keyword arguments passed to `self.vector_potential`.
+
+        Returns:
+            float: Magnetic flux linked by the loop.
+        """
+        curve = np.asarray(curve, dtype=float)
+        if not np.array_equal(curve[0], curve[-1]):
+            curve = np.concatenate((curve, curve[:1]))
+        dl = np.diff(curve, axis=0)
+        A = self.vector_potential(0.5 * (curve[1:] + curve[:-1]), **kwargs)
+        return np.sum(A * dl)
+
+    def hanson_hirshman(self, pos, response=False, nthreads=1, backend=None):
+        """Wrapper for the fortran code biotsavart.hanson_hirshman_coils
+
+        All coils and currents are passed to the Fortran kernel in a single call.
+
+        Args:
+            pos (ndarray, (n,3)): Evaluation points in space
+            response (bool, optional): Also return the field of every coil. Defaults to False.
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+
+        Returns:
+            ndarray, (n,3): Magnetic field at the evaluation point
+            ndarray, (ncoil,n,3): Magnetic field of each coil, only if `response` is True.
+        """
+        from .misc import biot_savart_coils
+
+        xyz, offsets, currents = self.pack()
+        return biot_savart_coils(
+            pos,
+            xyz,
+            offsets,
+            currents,
+            response=response,
+            nthreads=nthreads,
+            backend=backend,
+        )
+
+    def response_matrix(self, pos, group=False, nthreads=1):
+        """Linear response matrix between coil currents and the magnetic field.
+
+        The matrix with unit currents is cached for the point set `pos` and rebuilt
+        automatically when `pos` or the coil geometry changes. Changing only the
+        currents reuses the cache.
+
+        Args:
+            pos (array_like, (n,3)): Evaluation points in Cartesian coordinates.
+            group (bool, optional): Sum the coils of each current group into one column,
+                using the present coil currents. Columns are ordered as
+                `np.unique([coil.group for coil in self.data])`. Defaults to False.
+            nthreads (int, optional): Number of threads. Defaults to 1.
+
+        Returns:
+            numpy.ndarray, (n*3, ncoil) or (n*3, ngroup): Response matrix G, so that
+                `(G @ currents).reshape(-1, 3)` is the magnetic field.
+        """
+        pos = np.atleast_2d(np.asarray(pos, dtype=float))
+        xyz, offsets, currents = self.pack()
+        cache = self._response
+        if (
+            cache is None
+            or not np.array_equal(cache["pos"], pos)
+            or not np.array_equal(cache["offsets"], offsets)
+            or not np.array_equal(cache["xyz"], xyz)
+        ):
+            resp = self._unit_response(pos, nthreads)
+            G = np.reshape(resp, (self.num, -1)).T
+            cache = {"pos": pos.copy(), "xyz": xyz, "offsets": offsets, "G": G}
+            self._response = cache
+        if not group:
+            return cache["G"]
+        groups, inverse = np.unique(
+            [icoil.group for icoil in self.data], return_inverse=True
+        )
+        weight = np.zeros((self.num, len(groups)))
+        weight[np.arange(self.num), inverse] = currents
+        return np.matmul(cache["G"], weight)
+
+    def _unit_response(self, pos, nthreads=1):
+        """Magnetic field of every coil with unit current, (ncoil, n, 3)."""
+        from .misc import biot_savart_coils
+
+        xyz, offsets, currents = self.pack()
+        _, resp = biot_savart_coils(
+            pos, xyz, offsets, np.ones(self.num), response=True, nthreads=nthreads
+        )
+        return resp
+
+    def bfield_response(self, pos, currents=None, group=False, nthreads=1):
+        """Magnetic field from the cached response matrix, for new coil currents.
+
+        Args:
+            pos (array_like, (n,3)): Evaluation points in Cartesian coordinates.
+            currents (array_like, optional): Coil currents, or the scaling factors of
+                each current group if `group` is True. Defaults to None, using the
+                present coil currents.
+            group (bool, optional): Scale the current groups together. Defaults to False.
+            nthreads (int, optional): Number of threads. Defaults to 1.
+
+        Returns:
+            numpy.ndarray, (n,3): Magnetic field at the evaluation points.
+        """
+        G = self.response_matrix(pos, group=group, nthreads=nthreads)
+        if currents is None:
+            if group:
+                currents = np.ones(G.shape[1])
+            else:
+                currents = [icoil.I for icoil in self.data]
+        return np.reshape(np.matmul(G, np.asarray(currents, dtype=float)), (-1, 3))
+
     def plot(
         self,
         irange=[],
@@ -699,24 +1183,31 @@ class Coil(object):
     def save_makegrid(self, filename, nfp=1, **kwargs):
         """Write coils in the MAKEGRID format.
 
+        The points are formatted block by block, so the text of the whole file is
+        never held in memory.
+
         Args:
-            filename (str): File name and path.
+            filename (str or file): File name and path (gzipped if it ends with ".gz"),
+                or a file object opened in text mode, e.g. `gzip.open(name, "wt")`.
             nfp (int, optional): Number of toroidal periodicity. Defaults to 1.
         """
+        from .misc import _open_text, _write_table
+
         assert len(self) > 0
-        with open(filename, "w") as wfile:
+        with _open_text(filename) as wfile:
             wfile.write("periods {:3d} \n".format(nfp))
             wfile.write("begin filament \n")
             wfile.write("mirror NIL \n")
             for icoil in list(self):
                 Nseg = len(icoil.x)  # number of segments;
                 assert Nseg > 1
-                for iseg in range(Nseg - 1):  # the last point match the first one;
-                    wfile.write(
-                        "{:15.7E} {:15.7E} {:15.7E} {:15.7E}\n".format(
-                            icoil.x[iseg], icoil.y[iseg], icoil.z[iseg], icoil.I
-                        )
-                    )
+                # the last point match the first one;
+                table = np.empty((Nseg - 1, 4))
+                table[:, 0] = icoil.x[:-1]
+                table[:, 1] = icoil.y[:-1]
+                table[:, 2] = icoil.z[:-1]
+                table[:, 3] = icoil.I
+                _write_table(wfile, "%15.7E %15.7E %15.7E %15.7E\n", table)
                 wfile.write(
                     "{:15.7E} {:15.7E} {:15.7E} {:15.7E} {:} {:10} \n".format(
                         icoil.x[0], icoil.y[0], icoil.z[0], 0.0, icoil.group, icoil.name
@@ -729,10 +1220,13 @@ class Coil(object):
         """Write the data in standard ascii format for GPEC
 
         Args:
-            filename (str): path (if split==True) or file name to be saved.
+            filename (str or file): path (if split==True) or file name to be saved.
+                A file object opened in text mode is accepted if split==False.
             split (bool, optional): write each coil into a separate file. Defaults to True
             nw (integer, optional): number of windings. Defaults to 1.
         """
+        from .misc import _open_text, _write_table
+
         if split:
             # write in independent files
             for icoil in list(self):
@@ -745,15 +1239,11 @@ class Coil(object):
                         "{:>5}{:>5}{:>5}{:8.2f}\n".format(ncoil, s, nsec, nw)
                     )  # the first line with periods
                     # write each coil x, y, z
-                    for i in range(len(icoil.x)):
-                        f.write(
-                            "{:13.4e}{:13.4e}{:13.4e}\n".format(
-                                icoil.x[i], icoil.y[i], icoil.z[i]
-                            )
-                        )
+                    xyz = np.transpose([icoil.x, icoil.y, icoil.z])
+                    _write_table(f, "%13.4e%13.4e%13.4e\n", xyz)
         else:
             # write into one file
-            with open(filename, "w") as f:
+            with _open_text(filename) as f:
                 # write the defining parameters
                 ncoil = len(self)
                 s = 1  # have to assume this?
@@ -763,12 +1253,8 @@ class Coil(object):
                 )  # the first line with periods
                 # write each coil x, y, z
                 for icoil in list(self):
-                    for i in range(len(icoil.x)):
-                        f.write(
-                            "{:13.4e}{:13.4e}{:13.4e}\n".format(
-                                icoil.x[i], icoil.y[i], icoil.z[i]
-                            )
-                        )
+                    xyz = np.transpose([icoil.x, icoil.y, icoil.z])
+                    _write_table(f, "%13.4e%13.4e%13.4e\n", xyz)
         return
 
     def toVTK(self, vtkname, line=True, height=0.1, width=0.1, **kwargs):
@@ -845,3 +1331,338 @@ class Coil(object):
             data = meshio.Mesh(points=points, cells=[("hexahedron", hedrs)], **kwargs)
             data.write(vtkname)
         return
+
+
+class SymmetricCoil(Coil):
+    """Python object for a coil set with toroidal periodicity and stellarator symmetry.
+
+    Only the unique coils are stored in `self.data`. The full coil set consists of
+    the unique coils rotated by 2*pi*k/nfp (k=0,...,nfp-1) and, if `stellsym` is True,
+    their mirror images under (x,y,z) -> (x,-y,-z). Magnetic fields are computed by
+    rotating the evaluation points instead of the coils. Writing and plotting
+    (`save_makegrid`, `save_gpec_coils`, `toVTK`, `plot`) use the full coil set, while
+    `pack`, `save_npz` and `save_hdf5` keep the unique coils.
+
+    Args:
+        xx (list, optional): Unique coil data in x-coordinates. Defaults to [[]].
+        yy (list, optional): Unique coil data in y-coordinates. Defaults to [[]].
+        zz (list, optional): Unique coil data in z-coordinates. Defaults to [[]].
+        II (list, optional): Coil currents. Defaults to [[]].
+        names (list, optional): Coil names. Defaults to [[]].
+        groups (list, optional): Coil groups. Defaults to [[]].
+        nfp (int, optional): Number of toroidal periodicity. Defaults to 1.
+        stellsym (bool, optional): Stellarator symmetry. Defaults to False.
+
+    A full coil set can be converted using `self.from_coil`, like
+
+        ``
+        coil = SymmetricCoil.from_coil(Coil.read_makegrid('coils.sth'), nfp=2, stellsym=True)
+        ``
+    """
+
+    def __init__(
+        self, xx=[], yy=[], zz=[], II=[], names=[], groups=[], nfp=1, stellsym=False
+    ):
+        super().__init__(xx=xx, yy=yy, zz=zz, II=II, names=names, groups=groups)
+        assert nfp >= 1
+        self.nfp = nfp
+        self.stellsym = stellsym
+        return
+
+    @classmethod
+    def from_coil(cls, coil, nfp=1, stellsym=False, index=None, tol=1e-6):
+        """Keep the unique coils of a full coil set.
+
+        The symmetric images of the unique coils have to reproduce the full coil set
+        (in any order), which is checked with the centroid and the current times the
+        area vector of every coil.
+
+        Args:
+            coil (Coil): The full coil set.
+            nfp (int, optional): Number of toroidal periodicity. Defaults to 1.
+            stellsym (bool, optional): Stellarator symmetry. Defaults to False.
+            index (list, optional): Indices of the unique coils. Defaults to None,
+                using the first coil of each current group.
+            tol (float, optional): Relative tolerance of the check. Defaults to 1e-6.
+
+        Raises:
+            ValueError: The coils are not consistent with the symmetry.
+
+        Returns:
+            SymmetricCoil: The coil set with only unique coils.
+        """
+        from scipy.spatial import cKDTree
+
+        if index is None:
+            _, index = np.unique(
+                [icoil.group for icoil in coil.data], return_index=True
+            )
+            index = np.sort(index)
+        if len(index) * nfp * (2 if stellsym else 1) != coil.num:
+            raise ValueError(
+                "{:d} unique coils are inconsistent with {:d} coils, nfp={:d}, stellsym={:}.".format(
+                    len(index), coil.num, nfp, stellsym
+                )
+            )
+        data = [coil.data[i] for i in index]
+        symm = cls(
+            xx=[icoil.x for icoil in data],
+            yy=[icoil.y for icoil in data],
+            zz=[icoil.z for icoil in data],
+            II=[icoil.I for icoil in data],
+            names=[icoil.name for icoil in data],
+            groups=[icoil.group for icoil in data],
+            nfp=nfp,
+            stellsym=stellsym,
+        )
+        # every coil has to be matched by one symmetric image
+        given, images = _coil_signature(coil), _coil_signature(symm.full())
+        distance, match = cKDTree(given).query(images)
+        if np.any(distance > tol) or len(np.unique(match)) != coil.num:
+            raise ValueError(
+                "The coils are not reproduced by nfp={:d}, stellsym={:}, check the "
+                "unique coils (index).".format(nfp, stellsym)
+            )
+        return symm
+
+    def full(self):
+        """Expand to the full coil set.
+
+        Returns:
+            Coil: The coil set with all the coils.
+        """
+        from .misc import toroidal_period
+
+        xx, yy, zz, II, names, groups = [], [], [], [], [], []
+        for icoil in self.data:
+            xyz = np.transpose([icoil.x, icoil.y, icoil.z])
+            n = len(xyz)
+            copies = toroidal_period(xyz, self.nfp)
+            for k in range(self.nfp):
+                images = [copies[k * n : (k + 1) * n]]
+                if self.stellsym:
+                    # mirrored coil runs backward to keep the current direction
+                    images.append(images[0][::-1] * [1, -1, -1])
+                for image in images:
+                    xx.append(image[:, 0])
+                    yy.append(image[:, 1])
+                    zz.append(image[:, 2])
+                    II.append(icoil.I)
+                    names.append(icoil.name)
+                    groups.append(icoil.group)
+        return Coil(xx=xx, yy=yy, zz=zz, II=II, names=names, groups=groups)
+
+    def plot(self, irange=[], **kwargs):
+        """Plot the full coil set, see `Coil.plot` (irange indexes the full set)."""
+        return self.full().plot(irange=irange, **kwargs)
+
+    def save_makegrid(self, filename, nfp=None, **kwargs):
+        """Write the full coil set in the MAKEGRID format, see `Coil.save_makegrid`.
+
+        Args:
+            filename (str or file): File name and path, or a file object.
+            nfp (int, optional): Number of toroidal periodicity. Defaults to None,
+                using self.nfp.
+        """
+        nfp = self.nfp if nfp is None else nfp
+        return self.full().save_makegrid(filename, nfp=nfp, **kwargs)
+
+    def save_gpec_coils(self, filename, split=True, nw=1, **kwargs):
+        """Write the full coil set for GPEC, see `Coil.save_gpec_coils`."""
+        return self.full().save_gpec_coils(filename, split=split, nw=nw, **kwargs)
+
+    def toVTK(self, vtkname, line=True, height=0.1, width=0.1, **kwargs):
+        """Write the full coil set into a VTK file, see `Coil.toVTK`."""
+        return self.full().toVTK(
+            vtkname, line=line, height=height, width=width, **kwargs
+        )
+
+    def _symmetric(self, field, pos, tensor=False):
+        """Sum the field of all symmetric copies by mapping the evaluation points.
+
+        Args:
+            field (callable): Field of the unique coils, (m,3) -> (..., m, 3).
+            pos (ndarray, (n,3)): Evaluation points.
+            tensor (bool, optional): `field` returns the gradient, (m,3) -> (m,3,3).
+                Defaults to False.
+
+        Returns:
+            ndarray, (..., n, 3) or (n, 3, 3): Field of the full coil set.
+        """
+        from .misc import toroidal_period, rotation_matrix
+
+        n = len(pos)
+        points = toroidal_period(pos, self.nfp)
+        if self.stellsym:
+            points = np.concatenate((points, points * [1, -1, -1]))
+        rot = np.array(
+            [rotation_matrix(alpha=-2 * np.pi * k / self.nfp) for k in range(self.nfp)]
+        )
+        if tensor:
+            dB = np.reshape(field(points), (-1, self.nfp, n, 3, 3))
+            if self.stellsym:
+                # dB_mirror(x) = -S dB(S x) S
+                dB[1] *= -np.outer([1, -1, -1], [1, -1, -1])
+            return np.einsum("kij,sknjl,kml->nim", rot, dB, rot)
+        B = np.asarray(field(points))
+        B = np.reshape(B, B.shape[:-2] + (-1, self.nfp, n, 3))
+        if self.stellsym:
+            # B_mirror(x) = -S B(S x), S = diag(1,-1,-1)
+            B[..., 1, :, :, :] *= [-1, 1, 1]
+        # rotate the field back to the original evaluation points
+        return np.einsum("kij,...sknj->...ni", rot, B)
+
+    def bfield(self, pos, chunk=None, nthreads=1, backend=None):
+        """Calculate the magnetic field of the full coil set using the tangents.
+
+        Args:
+            pos (array_like, (3,) or (n,3)): Evaluation point(s) in Cartesian coordinates.
+            chunk (int, optional): Number of points evaluated per block. Defaults to None (automatic).
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+
+        Returns:
+            numpy.ndarray, (3,) or (n,3): B vector(s) produced by all coils.
+        """
+        pos = np.asarray(pos, dtype=float)
+        B = self._symmetric(
+            lambda p: Coil.bfield(self, p, chunk, nthreads, backend), np.atleast_2d(pos)
+        )
+        return B[0] if pos.ndim == 1 else B
+
+    def bfield_HH(self, pos, chunk=None, nthreads=1, backend=None, gradient=False):
+        """Calculate the magnetic field of the full coil set using the Hanson-Hirshman expression.
+
+        Args:
+            pos (array_like, (3,) or (n,3)): Evaluation point(s) in Cartesian coordinates.
+            chunk (int, optional): Number of points evaluated per block. Defaults to None (automatic).
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+            gradient (bool, optional): Also return the gradient dB_i/dx_j. Defaults to False.
+
+        Returns:
+            numpy.ndarray, (3,) or (n,3): B vector(s) produced by all coils.
+            numpy.ndarray, (3,3) or (n,3,3): Gradient of B, only if `gradient` is True.
+        """
+        pos = np.asarray(pos, dtype=float)
+        if gradient:
+            cache = {}
+
+            def unique(p):
+                cache["B"], dB = Coil.bfield_HH(
+                    self, p, chunk, nthreads, backend, gradient=True
+                )
+                return dB
+
+            dB = self._symmetric(unique, np.atleast_2d(pos), tensor=True)
+            B = self._symmetric(lambda p: cache["B"], np.atleast_2d(pos))
+            return (B[0], dB[0]) if pos.ndim == 1 else (B, dB)
+        B = self._symmetric(
+            lambda p: Coil.bfield_HH(self, p, chunk, nthreads, backend),
+            np.atleast_2d(pos),
+        )
+        return B[0] if pos.ndim == 1 else B
+
+    def hanson_hirshman(self, pos, response=False, nthreads=1, backend=None):
+        """Wrapper for the fortran code biotsavart.hanson_hirshman_coils
+
+        Args:
+            pos (ndarray, (n,3)): Evaluation points in space
+            response (bool, optional): Also return the field of every unique coil,
+                including all its symmetric copies. Defaults to False.
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+
+        Returns:
+            ndarray, (n,3): Magnetic field at the evaluation point
+            ndarray, (ncoil,n,3): Magnetic field of each unique coil, only if `response` is True.
+        """
+        pos = np.atleast_2d(np.asarray(pos, dtype=float))
+        if not response:
+            return self._symmetric(
+                lambda p: Coil.hanson_hirshman(self, p, False, nthreads, backend), pos
+            )
+        resp = self._symmetric(
+            lambda p: Coil.hanson_hirshman(self, p, True, nthreads, backend)[1], pos
+        )
+        return np.sum(resp, axis=0), resp
+
+    def vector_potential(self, pos, chunk=None, nthreads=1, backend=None):
+        """Calculate the vector potential of the full coil set made of straight segments.
+
+        Args:
+            pos (array_like, (3,) or (n,3)): Evaluation point(s) in Cartesian coordinates.
+            chunk (int, optional): Number of points evaluated per block. Defaults to None (automatic).
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Backend name. Defaults to None (the default backend).
+
+        Returns:
+            numpy.ndarray, (3,) or (n,3): A vector(s) produced by all coils.
+        """
+        pos = np.asarray(pos, dtype=float)
+        # A transforms like B: A_mirror(x) = -S A(S x)
+        A = self._symmetric(
+            lambda p: Coil.vector_potential(self, p, chunk, nthreads, backend),
+            np.atleast_2d(pos),
+        )
+        return A[0] if pos.ndim == 1 else A
+
+    def _unit_response(self, pos, nthreads=1):
+        """Magnetic field of every unique coil (and its copies) with unit current."""
+        return self._symmetric(
+            lambda p: Coil._unit_response(self, p, nthreads=nthreads), pos
+        )
+
+
+def _coil_signature(coil):
+    """Centroid and current times area vector of every coil, scaled to order one."""
+    centroid, moment = [], []
+    for icoil in coil.data:
+        xyz = np.transpose([icoil.x, icoil.y, icoil.z])
+        # closed polygon, the closing point may or may not be repeated
+        if np.array_equal(xyz[0], xyz[-1]):
+            xyz = xyz[:-1]
+        centroid.append(np.mean(xyz, axis=0))
+        moment.append(0.5 * icoil.I * np.sum(np.cross(xyz, np.roll(xyz, -1, 0)), 0))
+    centroid, moment = np.array(centroid), np.array(moment)
+    scale = max(np.max(np.abs(centroid)), 1e-300)
+    mscale = max(np.max(np.abs(moment)), 1e-300)
+    return np.hstack([centroid / scale, moment / mscale])
+
+
+def _line_columns(data, start=0, window=2 ** 22):
+    """Beginning, end and number of columns of the lines of a bytes-like buffer.
+
+    The buffer is scanned from `start` in windows of whole lines with vectorized byte
+    operations, and the scan stops after the first window with a line of less than
+    four columns.
+    """
+    begins, ends, ncol = [], [], []
+    size = len(data)
+    while start < size:
+        stop = min(start + window, size)
+        if stop < size:
+            # end the window after its last complete line
+            newline = data.rfind(b"\n", start, stop)
+            if newline < 0:
+                newline = data.find(b"\n", stop)
+            stop = size if newline < 0 else newline + 1
+        chars = np.frombuffer(data, dtype=np.uint8, count=stop - start, offset=start)
+        blank = chars <= 32
+        end = np.flatnonzero(chars == 10)
+        if chars[-1] != 10:
+            end = np.append(end, len(chars))
+        begin = np.concatenate(([0], end[:-1] + 1))
+        tokens = np.flatnonzero(~blank[1:] & blank[:-1]) + 1
+        if not blank[0]:
+            tokens = np.insert(tokens, 0, 0)
+        num = np.diff(np.searchsorted(tokens, np.concatenate(([0], end))))
+        begins.append(begin + start)
+        ends.append(end + start)
+        ncol.append(num)
+        start = stop
+        if np.any(num < 4):
+            break
+    if not ncol:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    return np.concatenate(begins), np.concatenate(ends), np.concatenate(ncol)
@@ -56,6 +56,7 @@ class Dipole(object):
             )
             self.symm = kwargs.get("symm", 2 * np.ones(self.num, dtype=int))
             self.rho = np.ones(self.num)
+        self.tree = None  # octree for self.bfield_tree
         return
 
     @classmethod
@@ -847,27 +848,110 @@ class Dipole(object):
             fig.show()
         return
 
-    def bfield(self, pos):
-        """Calculate the magnetic field at an arbitrary position.
+    def bfield(self, pos, dtype=np.float64, buffer_size=2 ** 20, gradient=False):
+        """Calculate the magnetic field at arbitrary positions.
            No symmetry info considered for now.
+           Dipoles with zero moments (e.g. rho=0) are skipped.
 
         Args:
-            pos (array_like): [x,y,z] Cartesian coordinates in space.
+            pos (array_like, (3,) or (n,3)): [x,y,z] Cartesian coordinates in space.
+            dtype (data-type, optional): Floating type used for the computation and
+                the accumulation, np.float32 halves the memory. Defaults to np.float64.
+            buffer_size (int, optional): Maximum number of point-dipole pairs in a tile.
+                Defaults to 2**20.
+            gradient (bool, optional): Also return the gradient dB_i/dx_j computed
+                in the same pass. Defaults to False.
 
         Returns:
-            numpy.array: The total magnetic field produced by all dipoles
+            numpy.array, (3,) or (n,3): The total magnetic field produced by all dipoles
+            numpy.array, (3,3) or (n,3,3): The gradient of B, only if gradient is True.
         """
         # calculate mx, my, mz if needed
         if not self.xyz_switch:
             self.sp2xyz()
-        # Biot-Savart law
-        pos = np.reshape(pos, (3, 1))
-        oxyz = np.asarray([self.ox, self.oy, self.oz])
-        rxyz = oxyz - pos
-        r = np.linalg.norm(rxyz, axis=0)
-        mxyz = np.asarray([self.mx, self.my, self.mz])
-        Bvec = 3 * np.sum(mxyz * rxyz, axis=0) / r ** 5 * rxyz - 1 / r ** 3 * mxyz
-        return 1e-7 * np.sum(Bvec, axis=1)
+        pos = np.asarray(pos)
+        points = np.atleast_2d(pos).astype(dtype)
+        mxyz = np.transpose([self.mx, self.my, self.mz]).astype(dtype)
+        keep = np.any(mxyz != 0, axis=1)
+        mxyz = mxyz[keep]
+        oxyz = np.transpose([self.ox, self.oy, self.oz]).astype(dtype)[keep]
+        # tiles of (npts, ndip) pairs
+        ndip = max(min(len(oxyz), buffer_size), 1)
+        npts = max(buffer_size // ndip, 1)
+        B = np.zeros((len(points), 3), dtype=dtype)
+        if gradient:
+            dB = np.zeros((len(points), 3, 3), dtype=dtype)
+        for i in range(0, len(points), npts):
+            p = points[i : i + npts]
+            for j in range(0, len(oxyz), ndip):
+                o = oxyz[j : j + ndip]
+                m = mxyz[j : j + ndip]
+                # Biot-Savart law
+                rx = o[:, 0] - p[:, 0:1]
+                ry = o[:, 1] - p[:, 1:2]
+                rz = o[:, 2] - p[:, 2:3]
+                r2 = rx * rx + ry * ry + rz * rz
+                r3 = r2 * np.sqrt(r2)
+                mr = 3 * (m[:, 0] * rx + m[:, 1] * ry + m[:, 2] * rz) / (r3 * r2)
+                B[i : i + npts, 0] += np.sum(mr * rx - m[:, 0] / r3, axis=1)
+                B[i : i + npts, 1] += np.sum(mr * ry - m[:, 1] / r3, axis=1)
+                B[i : i + npts, 2] += np.sum(mr * rz - m[:, 2] / r3, axis=1)
+                if not gradient:
+                    continue
+                # dB_a/dx_b = -3 (m_a r_b + m_b r_a) / r^5 - mr delta_ab + 5 mr r_a r_b / r^2
+                r5 = 3 / (r3 * r2)
+                mr5 = 5 * mr / r2
+                rr = (rx, ry, rz)
+                for a in range(3):
+                    for b in range(a, 3):
+                        g = mr5 * rr[a] * rr[b] - r5 * (m[:, a] * rr[b] + m[:, b] * rr[a])
+                        if a == b:
+                            g -= mr
+                        dB[i : i + npts, a, b] += np.sum(g, axis=1)
+        B *= 1e-7
+        if gradient:
+            # the gradient of a curl-free field is symmetric
+            dB *= 1e-7
+            dB += np.triu(dB, 1).transpose(0, 2, 1)
+            return (B[0], dB[0]) if pos.ndim == 1 else (B, dB)
+        return B[0] if pos.ndim == 1 else B
+
+    def build_tree(self, leafsize=64):
+        """Build an octree of the dipoles for fast approximate field evaluation.
+           The tree is saved in self.tree and reused by self.bfield_tree.
+           Call it again after the dipoles are changed.
+
+        Args:
+            leafsize (int, optional): Maximum number of dipoles in a leaf. Defaults to 64.
+
+        Returns:
+            DipoleTree: The octree.
+        """
+        # calculate mx, my, mz if needed
+        if not self.xyz_switch:
+            self.sp2xyz()
+        self.tree = DipoleTree(
+            np.transpose([self.ox, self.oy, self.oz]),
+            np.transpose([self.mx, self.my, self.mz]),
+            leafsize=leafsize,
+        )
+        return self.tree
+
+    def bfield_tree(self, pos, theta=0.2):
+        """Calculate the magnetic field using the Barnes-Hut octree (see self.build_tree).
+
+        Args:
+            pos (array_like, (3,) or (n,3)): Cartesian coordinates in space.
+            theta (float, optional): Opening angle, the accuracy parameter. A cluster with
+                radius r at distance d is aggregated if r < theta * d. The relative error
+                is about theta**2, theta=0 is the direct sum. Defaults to 0.2.
+
+        Returns:
+            numpy.array: The total magnetic field produced by all dipoles
+        """
+        if self.tree is None:
+            self.build_tree()
+        return self.tree.bfield(pos, theta=theta)
 
     def __repr__(self):
         return "FAMUS dipole class, num={:d}, symmetry={:}, filename={:}".format(
@@ -921,6 +1005,186 @@ class Dipole(object):
         )
 
 
+class DipoleTree(object):
+    """Barnes-Hut octree for the magnetic field of a large number of dipoles.
+
+    Each node keeps the total moment M = sum(m_i) and the first moment
+    Q = sum(m_i (r_i - c)^T) around its center c. A node far enough from the
+    evaluation point is replaced by this expansion, with an error of O((r/d)^2),
+    while nearby leaves are summed directly. With the opening angle theta, the
+    relative error of the total field is about theta**2 (use self.error to check).
+
+    Args:
+        xyz (numpy.ndarray, (num,3)): Dipole positions.
+        moment (numpy.ndarray, (num,3)): Dipole moments.
+        leafsize (int, optional): Maximum number of dipoles in a leaf. Defaults to 64.
+    """
+
+    def __init__(self, xyz, moment, leafsize=64):
+        xyz = np.asarray(xyz, dtype=float)
+        moment = np.asarray(moment, dtype=float)
+        # dipoles without moments do not contribute
+        keep = np.any(moment != 0, axis=1)
+        xyz = xyz[keep]
+        moment = moment[keep]
+        self.leafsize = leafsize
+        self.num = len(xyz)
+        perm = np.arange(self.num)
+        center, radius, M, Q = [], [], [], []
+        first, last, child, nchild = [], [], [], []
+
+        def add_node(start, end):
+            members = perm[start:end]
+            c = np.mean(xyz[members], axis=0)
+            dr = xyz[members] - c
+            center.append(c)
+            radius.append(np.sqrt(np.max(np.sum(dr * dr, axis=1))))
+            M.append(np.sum(moment[members], axis=0))
+            Q.append(np.matmul(moment[members].T, dr))
+            first.append(start)
+            last.append(end)
+            child.append(0)
+            nchild.append(0)
+            return len(first) - 1
+
+        stack = [add_node(0, self.num)] if self.num > 0 else []
+        while stack:
+            inode = stack.pop()
+            start, end = first[inode], last[inode]
+            if end - start <= leafsize or radius[inode] == 0:
+                continue
+            # split into octants around the center
+            members = perm[start:end]
+            code = np.matmul(xyz[members] > center[inode], [4, 2, 1])
+            order = np.argsort(code, kind="stable")
+            perm[start:end] = members[order]
+            counts = np.bincount(code, minlength=8)
+            bounds = start + np.concatenate(([0], np.cumsum(counts)))
+            child[inode] = len(first)
+            for i in range(8):
+                if counts[i] > 0:
+                    stack.append(add_node(bounds[i], bounds[i + 1]))
+                    nchild[inode] += 1
+        self.xyz = xyz[perm]
+        self.moment = moment[perm]
+        self.center = np.reshape(center, (-1, 3))
+        self.radius = np.array(radius)
+        self.M = np.reshape(M, (-1, 3))
+        self.Q = np.reshape(Q, (-1, 3, 3))
+        self.first = np.array(first, dtype=int)
+        self.last = np.array(last, dtype=int)
+        self.child = np.array(child, dtype=int)
+        self.nchild = np.array(nchild, dtype=int)
+        return
+
+    def bfield(self, pos, theta=0.2, buffer_size=2 ** 20):
+        """Approximate magnetic field at the evaluation points.
+
+        Args:
+            pos (array_like, (3,) or (n,3)): Cartesian coordinates in space.
+            theta (float, optional): Opening angle, the accuracy parameter. Defaults to 0.2.
+            buffer_size (int, optional): Maximum number of direct point-dipole pairs
+                evaluated at once. Defaults to 2**20.
+
+        Returns:
+            numpy.array, (3,) or (n,3): The total magnetic field produced by all dipoles
+        """
+        pos = np.asarray(pos, dtype=float)
+        points = np.atleast_2d(pos)
+        npos = len(points)
+        B = np.zeros((npos, 3))
+        ipts = np.arange(npos) if self.num > 0 else np.arange(0)
+        nodes = np.zeros(npos, dtype=int)
+        while len(ipts):
+            R = points[ipts] - self.center[nodes]
+            far = self.radius[nodes] < theta * np.sqrt(np.sum(R * R, axis=1))
+            B += self._multipole(R[far], nodes[far], ipts[far], npos)
+            near = ~far
+            leaf = near & (self.nchild[nodes] == 0)
+            B += self._direct(points, ipts[leaf], nodes[leaf], buffer_size)
+            # open the remaining nodes
+            split = near & ~leaf
+            counts = self.nchild[nodes[split]]
+            ipts = np.repeat(ipts[split], counts)
+            nodes = np.repeat(self.child[nodes[split]], counts) + _ranges(counts)
+        return B[0] if pos.ndim == 1 else B
+
+    def _multipole(self, R, nodes, ipts, npos):
+        """Field of the node expansions, accumulated to the evaluation points."""
+        M = self.M[nodes]
+        Q = self.Q[nodes]
+        r2 = np.sum(R * R, axis=1, keepdims=True)
+        r3 = r2 * np.sqrt(r2)
+        r5 = r3 * r2
+        QR = np.einsum("nij,nj->ni", Q, R)
+        QTR = np.einsum("nji,nj->ni", Q, R)
+        trQ = np.trace(Q, axis1=1, axis2=2)[:, np.newaxis]
+        RQR = np.sum(R * QR, axis=1, keepdims=True)
+        Bvec = (
+            3 * np.sum(M * R, axis=1, keepdims=True) / r5 * R
+            - M / r3
+            - 3 * (trQ * R + QR + QTR) / r5
+            + 15 * RQR / (r5 * r2) * R
+        )
+        return 1e-7 * _accumulate(ipts, Bvec, npos)
+
+    def _direct(self, points, ipts, nodes, buffer_size):
+        """Direct sum over the dipoles in the leaves, accumulated to the evaluation points."""
+        B = np.zeros((len(points), 3))
+        counts = self.last[nodes] - self.first[nodes]
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        start = 0
+        while start < len(nodes):
+            # pairs in this block are bounded by buffer_size
+            end = np.searchsorted(bounds, bounds[start] + buffer_size, "right") - 1
+            end = max(end, start + 1)
+            _counts = counts[start:end]
+            _ipts = np.repeat(ipts[start:end], _counts)
+            idip = np.repeat(self.first[nodes[start:end]], _counts) + _ranges(_counts)
+            R = points[_ipts] - self.xyz[idip]
+            m = self.moment[idip]
+            r2 = np.sum(R * R, axis=1, keepdims=True)
+            r3 = r2 * np.sqrt(r2)
+            Bvec = 3 * np.sum(m * R, axis=1, keepdims=True) / (r3 * r2) * R - m / r3
+            B += 1e-7 * _accumulate(_ipts, Bvec, len(points))
+            start = end
+        return B
+
+    def error(self, pos, theta=0.2):
+        """Relative error of the octree evaluation against the direct sum.
+
+        Args:
+            pos (array_like, (n,3)): Cartesian coordinates of the sample points.
+            theta (float, optional): Opening angle, the accuracy parameter. Defaults to 0.2.
+
+        Returns:
+            float: max(|B_tree - B_direct|) / max(|B_direct|)
+        """
+        points = np.atleast_2d(np.asarray(pos, dtype=float))
+        direct = self._direct(
+            points,
+            np.arange(len(points)),
+            np.zeros(len(points), dtype=int),
+            2 ** 20,
+        )
+        diff = np.linalg.norm(self.bfield(points, theta=theta) - direct, axis=1)
+        return np.max(diff) / np.max(np.linalg.norm(direct, axis=1))
+
+
+def _ranges(counts):
+    """Concatenated np.arange(count) for every count."""
+    counts = np.asarray(counts, dtype=int)
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - counts, counts)
+
+
+def _accumulate(index, values, n):
+    """Sum the rows of values (m,3) into an (n,3) array at the given indices."""
+    return np.transpose(
+        [np.bincount(index, weights=values[:, i], minlength=n) for i in range(3)]
+    )
+
+
 class GAdipole(Dipole):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
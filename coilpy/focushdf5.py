@@ -182,51 +182,30 @@ class FOCUSHDF5(HDF5):
         plt.legend()
         return line
 
+    # poincare data
+    def poincare(self):
+        """Poincare crossings computed by FOCUS.
+
+        Returns:
+            Poincare: The crossings of the `self.pp_ns` field lines.
+        """
+        from .poincare import Poincare
+
+        data = np.stack([np.transpose(self.ppr), np.transpose(self.ppz)], axis=-1)
+        return Poincare(data, source=self.filename)
+
     # poincare plot
     def poincare_plot(self, color=None, prange="full", **kwargs):
         """Poincare plot from FOCUS output.
         Args:
              color (matplotlib color, or None): dot colors. Defaults to None (rainbow).
-             prange (str, optional): Plot range, one of ["upper", "lower", "all"]. Defaults to "full".
+             prange (str, optional): Plot range, one of ["upper", "lower", "full"]. Defaults to "full".
              kwargs : matplotlib scatter keyword arguments
 
         Returns:
-             None
+             matplotlib.collections.PathCollection: The scatter collection.
         """
-        import matplotlib.pyplot as plt
-        from matplotlib import cm
-
-        # get figure and ax data
-        if plt.get_fignums():
-            fig = plt.gcf()
-            ax = plt.gca()
-        else:
-            fig, ax = plt.subplots()
-
-        # get colors
-        if color is None:
-            colors = cm.rainbow(np.linspace(1, 0, self.pp_ns))
-        else:
-            colors = [color] * self.pp_ns
-        kwargs["s"] = kwargs.get("s", 0.1)  # dotsize
-        # scatter plot
-        for i in range(self.pp_ns):
-            # determine whether plot upper or lower
-            if prange == "upper":
-                cond = self.ppz[:, i] > 0
-            elif prange == "lower":
-                cond = self.ppz[:, i] < 0
-            else:
-                cond = np.ones_like(self.ppz[:, i], dtype=bool)
-            ax.scatter(
-                self.ppr[:, i][cond], self.ppz[:, i][cond], color=colors[i], **kwargs
-            )
-        plt.axis("equal")
-        plt.xlabel("R [m]", fontsize=20)
-        plt.ylabel("Z [m]", fontsize=20)
-        plt.xticks(fontsize=16)
-        plt.yticks(fontsize=16)
-        return
+        return self.poincare().plot(color=color, prange=prange, **kwargs)
 
     # Bnorm plot
     def Bnorm(self, plottype="2D", source="all", axes=None, flip=False, **kwargs):
@@ -1,4 +1,4 @@
-SUBROUTINE biot_savart(pos, coilxyz, current, dl, bfield, npos, nseg)
+SUBROUTINE biot_savart(pos, coilxyz, current, dl, bfield, npos, nseg, nthreads)
    ! Calculate magnetic field using the Biot-Savart Law
    ! (the close point doesn't have to be repeated!)
    !
@@ -9,18 +9,22 @@ SUBROUTINE biot_savart(pos, coilxyz, current, dl, bfield, npos, nseg)
    !       dl(nseg,3): double, tangent vector (dx, dy, dz)
    !       npos: int, optional, number of evaluation points
    !       nseg: int, optional, number of coil segments
+   !       nthreads: int, optional, number of OpenMP threads (default: 1)
    ! output params:
    !       bfield(npos,3): double, B-vec at the evaluation points
    IMPLICIT NONE
 
-   INTEGER, INTENT(IN) :: npos, nseg
+   INTEGER, INTENT(IN) :: npos, nseg, nthreads
    REAL*8, INTENT(IN) :: pos(npos, 3), coilxyz(nseg, 3), current, dl(nseg, 3)
    REAL*8, INTENT(OUT) :: bfield(npos, 3)
+   !f2py INTEGER, OPTIONAL, INTENT(IN) :: nthreads = 1
 
    INTEGER :: i, j
    REAL*8 :: x, y, z, lx, ly, lz, rm3, Bx, By, Bz
-   REAL*8, PARAMETER :: mu0_over_4pi = 1.0E-7
+   REAL*8, PARAMETER :: mu0_over_4pi = 1.0D-7
 
+   !$OMP PARALLEL DO NUM_THREADS(nthreads) SCHEDULE(STATIC) &
+   !$OMP PRIVATE(i, j, x, y, z, lx, ly, lz, rm3, Bx, By, Bz)
    DO i = 1, npos
       x = pos(i, 1); y = pos(i, 2); z = pos(i, 3)
       Bx = 0; By = 0; Bz = 0
@@ -37,6 +41,7 @@ SUBROUTINE biot_savart(pos, coilxyz, current, dl, bfield, npos, nseg)
       bfield(i, 2) = By
       bfield(i, 3) = Bz
    END DO
+   !$OMP END PARALLEL DO
 
    bfield = bfield*mu0_over_4pi*current
 
@@ -44,7 +49,7 @@ SUBROUTINE biot_savart(pos, coilxyz, current, dl, bfield, npos, nseg)
 
 END SUBROUTINE biot_savart
 
-SUBROUTINE hanson_hirshman(pos, coilxyz, current, bfield, npos, nseg)
+SUBROUTINE hanson_hirshman(pos, coilxyz, current, bfield, npos, nseg, nthreads)
    ! Calculate magnetic field using the Hanse-Hirshman expression
    !
    ! input params:
@@ -53,18 +58,22 @@ SUBROUTINE hanson_hirshman(pos, coilxyz, current, bfield, npos, nseg)
    !       current: double, coil current
    !       npos: int, optional, number of evaluation points
    !       nseg: int, optional, number of coil segments
+   !       nthreads: int, optional, number of OpenMP threads (default: 1)
    ! output params:
    !       bfield(npos,3): double, B-vec at the evaluation points
    IMPLICIT NONE
 
-   INTEGER, INTENT(IN) :: npos, nseg
+   INTEGER, INTENT(IN) :: npos, nseg, nthreads
    REAL*8, INTENT(IN) :: pos(npos, 3), coilxyz(nseg, 3), current
    REAL*8, INTENT(OUT) :: bfield(npos, 3)
+   !f2py INTEGER, OPTIONAL, INTENT(IN) :: nthreads = 1
 
    INTEGER :: i, j
    REAL*8 :: x, y, z, Rix, Riy, Riz, Ri, Rfx, Rfy, Rfz, Rf, lx, ly, lz, ll, Rfac, Bx, By, Bz
-   REAL*8, PARAMETER :: mu0_over_4pi = 1.0E-7
+   REAL*8, PARAMETER :: mu0_over_4pi = 1.0D-7
 
+   !$OMP PARALLEL DO NUM_THREADS(nthreads) SCHEDULE(STATIC) &
+   !$OMP PRIVATE(i, j, x, y, z, Rix, Riy, Riz, Ri, Rfx, Rfy, Rfz, Rf, lx, ly, lz, ll, Rfac, Bx, By, Bz)
    DO i = 1, npos
       x = pos(i, 1); y = pos(i, 2); z = pos(i, 3)
       Bx = 0; By = 0; Bz = 0
@@ -84,12 +93,178 @@ SUBROUTINE hanson_hirshman(pos, coilxyz, current, bfield, npos, nseg)
       bfield(i, 2) = By
       bfield(i, 3) = Bz
    END DO
+   !$OMP END PARALLEL DO
 
    bfield = bfield*mu0_over_4pi*current
 
    RETURN
 END SUBROUTINE hanson_hirshman
 
+SUBROUTINE hanson_hirshman_coils(pos, coilxyz, offsets, currents, bfield, npos, npts, ncoil, nthreads)
+   ! Calculate the total magnetic field of a coil set using the Hanse-Hirshman expression
+   !
+   ! input params:
+   !       pos(npos,3): double, positions to be evaluated
+   !       coilxyz(npts,3): double, xyz points of all coils, concatenated
+   !       offsets(ncoil+1): int, zero-based offsets, coil k is coilxyz(offsets(k)+1:offsets(k+1), :)
+   !       currents(ncoil): double, coil currents
+   !       npos: int, optional, number of evaluation points
+   !       npts: int, optional, total number of coil points
+   !       ncoil: int, optional, number of coils
+   !       nthreads: int, optional, number of OpenMP threads (default: 1)
+   ! output params:
+   !       bfield(npos,3): double, B-vec at the evaluation points
+   IMPLICIT NONE
+
+   INTEGER, INTENT(IN) :: npos, npts, ncoil, nthreads
+   INTEGER, INTENT(IN) :: offsets(ncoil + 1)
+   REAL*8, INTENT(IN) :: pos(npos, 3), coilxyz(npts, 3), currents(ncoil)
+   REAL*8, INTENT(OUT) :: bfield(npos, 3)
+   !f2py INTEGER, OPTIONAL, INTENT(IN) :: nthreads = 1
+
+   INTEGER :: i, k
+   REAL*8 :: B(3)
+
+   !$OMP PARALLEL DO NUM_THREADS(nthreads) SCHEDULE(STATIC) PRIVATE(i, k, B)
+   DO i = 1, npos
+      bfield(i, :) = 0
+      DO k = 1, ncoil
+         CALL hanson_hirshman_point(pos(i, 1), pos(i, 2), pos(i, 3), coilxyz, npts, offsets(k) + 1, offsets(k + 1), B)
+         bfield(i, :) = bfield(i, :) + B*currents(k)
+      END DO
+   END DO
+   !$OMP END PARALLEL DO
+
+   RETURN
+END SUBROUTINE hanson_hirshman_coils
+
+SUBROUTINE hanson_hirshman_response(pos, coilxyz, offsets, currents, response, npos, npts, ncoil, nthreads)
+   ! Calculate the magnetic field of every coil in a coil set using the Hanse-Hirshman expression
+   !
+   ! input params:
+   !       pos(npos,3): double, positions to be evaluated
+   !       coilxyz(npts,3): double, xyz points of all coils, concatenated
+   !       offsets(ncoil+1): int, zero-based offsets, coil k is coilxyz(offsets(k)+1:offsets(k+1), :)
+   !       currents(ncoil): double, coil currents
+   !       npos: int, optional, number of evaluation points
+   !       npts: int, optional, total number of coil points
+   !       ncoil: int, optional, number of coils
+   !       nthreads: int, optional, number of OpenMP threads (default: 1)
+   ! output params:
+   !       response(ncoil,npos,3): double, B-vec of each coil at the evaluation points
+   IMPLICIT NONE
+
+   INTEGER, INTENT(IN) :: npos, npts, ncoil, nthreads
+   INTEGER, INTENT(IN) :: offsets(ncoil + 1)
+   REAL*8, INTENT(IN) :: pos(npos, 3), coilxyz(npts, 3), currents(ncoil)
+   REAL*8, INTENT(OUT) :: response(ncoil, npos, 3)
+   !f2py INTEGER, OPTIONAL, INTENT(IN) :: nthreads = 1
+
+   INTEGER :: i, k
+   REAL*8 :: B(3)
+
+   !$OMP PARALLEL DO NUM_THREADS(nthreads) SCHEDULE(STATIC) PRIVATE(i, k, B)
+   DO i = 1, npos
+      DO k = 1, ncoil
+         CALL hanson_hirshman_point(pos(i, 1), pos(i, 2), pos(i, 3), coilxyz, npts, offsets(k) + 1, offsets(k + 1), B)
+         response(k, i, :) = B*currents(k)
+      END DO
+   END DO
+   !$OMP END PARALLEL DO
+
+   RETURN
+END SUBROUTINE hanson_hirshman_response
+
+SUBROUTINE hanson_hirshman_point(x, y, z, coilxyz, npts, first, last, B)
+   ! Magnetic field of the coil coilxyz(first:last, :) with unit current at the point (x, y, z)
+   ! (Hanson-Hirshman expression)
+   ! Internal helper, the point is passed as scalars to avoid an array temporary per call.
+   ! It is left out of the Python wrapper (see the f2py "only:" list in setup.py).
+   IMPLICIT NONE
+
+   INTEGER, INTENT(IN) :: npts, first, last
+   REAL*8, INTENT(IN) :: x, y, z, coilxyz(npts, 3)
+   REAL*8, INTENT(OUT) :: B(3)
+
+   INTEGER :: j
+   REAL*8 :: Rix, Riy, Riz, Ri, Rfx, Rfy, Rfz, Rf, lx, ly, lz, ll, Rfac
+   REAL*8, PARAMETER :: mu0_over_4pi = 1.0D-7
+
+   B = 0
+   DO j = first, last - 1
+      Rix = x - coilxyz(j, 1); Rfx = x - coilxyz(j + 1, 1); lx = coilxyz(j + 1, 1) - coilxyz(j, 1)
+      Riy = y - coilxyz(j, 2); Rfy = y - coilxyz(j + 1, 2); ly = coilxyz(j + 1, 2) - coilxyz(j, 2)
+      Riz = z - coilxyz(j, 3); Rfz = z - coilxyz(j + 1, 3); lz = coilxyz(j + 1, 3) - coilxyz(j, 3)
+      Ri = sqrt(Rix*Rix + Riy*Riy + Riz*Riz)
+      Rf = sqrt(Rfx*Rfx + Rfy*Rfy + Rfz*Rfz)
+      ll = sqrt(lx*lx + ly*ly + lz*lz)
+      Rfac = 2*(Ri + Rf)/(Ri*Rf)/((Ri + Rf)**2 - ll**2)
+      B(1) = B(1) + Rfac*(ly*Riz - lz*Riy)
+      B(2) = B(2) + Rfac*(lz*Rix - lx*Riz)
+      B(3) = B(3) + Rfac*(lx*Riy - ly*Rix)
+   END DO
+   B = B*mu0_over_4pi
+
+   RETURN
+END SUBROUTINE hanson_hirshman_point
+
+SUBROUTINE vector_potential_coils(pos, coilxyz, offsets, currents, apot, npos, npts, ncoil, nthreads)
+   ! Calculate the vector potential of a coil set made of straight segments
+   ! A = mu0/4pi * I * l/|l| * log((Ri + Rf + |l|)/(Ri + Rf - |l|))
+   !
+   ! input params:
+   !       pos(npos,3): double, positions to be evaluated
+   !       coilxyz(npts,3): double, xyz points of all coils, concatenated
+   !       offsets(ncoil+1): int, zero-based offsets, coil k is coilxyz(offsets(k)+1:offsets(k+1), :)
+   !       currents(ncoil): double, coil currents
+   !       npos: int, optional, number of evaluation points
+   !       npts: int, optional, total number of coil points
+   !       ncoil: int, optional, number of coils
+   !       nthreads: int, optional, number of OpenMP threads (default: 1)
+   ! output params:
+   !       apot(npos,3): double, A-vec at the evaluation points
+   IMPLICIT NONE
+
+   INTEGER, INTENT(IN) :: npos, npts, ncoil, nthreads
+   INTEGER, INTENT(IN) :: offsets(ncoil + 1)
+   REAL*8, INTENT(IN) :: pos(npos, 3), coilxyz(npts, 3), currents(ncoil)
+   REAL*8, INTENT(OUT) :: apot(npos, 3)
+   !f2py INTEGER, OPTIONAL, INTENT(IN) :: nthreads = 1
+
+   INTEGER :: i, j, k
+   REAL*8 :: Rix, Riy, Riz, Ri, Rfx, Rfy, Rfz, Rf, lx, ly, lz, ll, Afac, A(3)
+   REAL*8, PARAMETER :: mu0_over_4pi = 1.0D-7
+
+   !$OMP PARALLEL DO NUM_THREADS(nthreads) SCHEDULE(STATIC) &
+   !$OMP PRIVATE(i, j, k, Rix, Riy, Riz, Ri, Rfx, Rfy, Rfz, Rf, lx, ly, lz, ll, Afac, A)
+   DO i = 1, npos
+      apot(i, :) = 0
+      DO k = 1, ncoil
+         A = 0
+         DO j = offsets(k) + 1, offsets(k + 1) - 1
+            Rix = pos(i, 1) - coilxyz(j, 1); Rfx = pos(i, 1) - coilxyz(j + 1, 1); lx = coilxyz(j + 1, 1) - coilxyz(j, 1)
+            Riy = pos(i, 2) - coilxyz(j, 2); Rfy = pos(i, 2) - coilxyz(j + 1, 2); ly = coilxyz(j + 1, 2) - coilxyz(j, 2)
+            Riz = pos(i, 3) - coilxyz(j, 3); Rfz = pos(i, 3) - coilxyz(j + 1, 3); lz = coilxyz(j + 1, 3) - coilxyz(j, 3)
+            ll = sqrt(lx*lx + ly*ly + lz*lz)
+            ! a repeated point, e.g. the closing point, does not contribute
+            IF (ll == 0) CYCLE
+            Ri = sqrt(Rix*Rix + Riy*Riy + Riz*Riz)
+            Rf = sqrt(Rfx*Rfx + Rfy*Rfy + Rfz*Rfz)
+            Afac = log((Ri + Rf + ll)/(Ri + Rf - ll))/ll
+            A(1) = A(1) + Afac*lx
+            A(2) = A(2) + Afac*ly
+            A(3) = A(3) + Afac*lz
+         END DO
+         apot(i, :) = apot(i, :) + A*currents(k)
+      END DO
+   END DO
+   !$OMP END PARALLEL DO
+
+   apot = apot*mu0_over_4pi
+
+   RETURN
+END SUBROUTINE vector_potential_coils
+
 !---------------- test case ------------
 PROGRAM test
    IMPLICIT NONE
@@ -97,6 +272,8 @@ PROGRAM test
    INTEGER :: i
    INTEGER, PARAMETER :: nseg = 256, npos = 5
    REAL*8 :: pos(npos, 3), xyz(nseg, 3), bfield(npos, 3), theta, pi2, current, dl(nseg, 3), Bz
+   REAL*8 :: xyz2(2*nseg, 3), currents(2)
+   INTEGER :: offsets(3)
 
    current = 1.0E6
    pi2 = ASIN(1.0)*4
@@ -116,21 +293,44 @@ PROGRAM test
       pos(i, 3) = (i - 1)*0.5
    END DO
 
-   call hanson_hirshman(pos, xyz, current, bfield, npos, nseg)
+   call hanson_hirshman(pos, xyz, current, bfield, npos, nseg, 2)
    PRINT *, "Hanson-Hirshman field calculation:"
    WRITE (6, "(3(A12, ', '))") 'diff Bx', 'diff By', 'diff Bz'
    DO i = 1, npos
-      Bz = 1.0E-7*current*pi2/(pos(i, 3)**2 + 1)**1.5
+      Bz = 1.0D-7*current*pi2/(pos(i, 3)**2 + 1)**1.5
       WRITE (6, "(3(ES12.5, ', '))") bfield(i, 1), bfield(i, 2), bfield(i, 3) - Bz
    END DO
 
    bfield = 0
-   call biot_savart(pos, xyz(1:nseg - 1, 1:3), current, dl(1:nseg - 1, 1:3), bfield, npos, nseg - 1)
+   call biot_savart(pos, xyz(1:nseg - 1, 1:3), current, dl(1:nseg - 1, 1:3), bfield, npos, nseg - 1, 2)
    PRINT *, "Biot-Savart field calculation:"
    WRITE (6, "(3(A12, ', '))") 'diff Bx', 'diff By', 'diff Bz'
    DO i = 1, npos
-      Bz = 1.0E-7*current*pi2/(pos(i, 3)**2 + 1)**1.5
+      Bz = 1.0D-7*current*pi2/(pos(i, 3)**2 + 1)**1.5
+      WRITE (6, "(3(ES12.5, ', '))") bfield(i, 1), bfield(i, 2), bfield(i, 3) - Bz
+   END DO
+
+   ! two copies of the same coil carrying half of the current
+   xyz2(1:nseg, :) = xyz
+   xyz2(nseg + 1:2*nseg, :) = xyz
+   offsets = (/0, nseg, 2*nseg/)
+   currents = current/2
+   bfield = 0
+   call hanson_hirshman_coils(pos, xyz2, offsets, currents, bfield, npos, 2*nseg, 2, 2)
+   PRINT *, "Multi-coil Hanson-Hirshman field calculation:"
+   WRITE (6, "(3(A12, ', '))") 'diff Bx', 'diff By', 'diff Bz'
+   DO i = 1, npos
+      Bz = 1.0D-7*current*pi2/(pos(i, 3)**2 + 1)**1.5
       WRITE (6, "(3(ES12.5, ', '))") bfield(i, 1), bfield(i, 2), bfield(i, 3) - Bz
    END DO
 
+   ! vector potential on the axis is zero
+   bfield = 1
+   call vector_potential_coils(pos, xyz2, offsets, currents, bfield, npos, 2*nseg, 2, 2)
+   PRINT *, "Multi-coil vector potential calculation:"
+   WRITE (6, "(3(A12, ', '))") 'Ax', 'Ay', 'Az'
+   DO i = 1, npos
+      WRITE (6, "(3(ES12.5, ', '))") bfield(i, 1), bfield(i, 2), bfield(i, 3)
+   END DO
+
 END PROGRAM test
@@ -1,8 +1,21 @@
+import math
 import numpy as np
 
 
 class Mgrid(object):
-    def __init__(self, r, z, phi, Br, Bz, Bphi, nfp=1):
+    """Magnetic field on a cylindrical (R,Z,phi) grid, like the MAKEGRID output.
+
+    The fields Br, Bz and Bphi have the shape (nr,nz,nphi+1), the last toroidal
+    cross-section repeats the first one at phi = 2*pi/nfp.
+
+    The grid has to be uniform: r and z equally spaced, and phi equal to
+    np.linspace(0, 2*pi/nfp, nphi+1). `self.interpolate` (called at initialization)
+    raises an AssertionError otherwise; binary mgrid files are always uniform.
+    """
+
+    def __init__(
+        self, r, z, phi, Br, Bz, Bphi, nfp=1, Bgroup=None, extcur=None, curlabel=None
+    ):
         self.r = r
         self.z = z
         self.phi = phi
@@ -10,11 +23,36 @@ class Mgrid(object):
         self.Bz = Bz
         self.Bphi = Bphi
         self.nfp = nfp
+        # field of each current group per unit extcur, (nextcur,3,nr,nz,nphi) for
+        # (Br,Bz,Bphi), without the repeated toroidal cross-section
+        self.Bgroup = Bgroup
+        self.extcur = extcur
+        self.curlabel = curlabel
+        self.order = 1
         self.interpolate()
         return
 
     @classmethod
-    def read_mgrid_bin(cls, filename, extcur=None):
+    def read_mgrid_bin(cls, filename, extcur=None, dtype=np.float64, mmap=False):
+        """Read the binary mgrid file written by MAKEGRID (or `self.write_mgrid_bin`).
+
+        The field of every current group is kept in `self.Bgroup`, so the currents can
+        be changed later with `self.set_extcur` without reading the file again.
+
+        Args:
+            filename (str): File name and path.
+            extcur (array_like or str, optional): Group currents, or a file containing
+                them. Defaults to None, using the currents in the file (2000 style) or ones.
+            dtype (data-type, optional): Floating type of the per-group fields,
+                np.float32 halves the memory. Defaults to np.float64.
+            mmap (bool, optional): Memory-map the group records instead of reading them.
+                Only the groups with nonzero currents are decoded, one toroidal
+                cross-section at a time, so the memory is bounded by the totals.
+                `dtype` is ignored. Defaults to False.
+
+        Returns:
+            Mgrid: The mgrid.
+        """
 
         f = open(filename, "rb")
         # nr, nz, etc.
@@ -43,25 +81,33 @@ class Mgrid(object):
         (nbytes,) = np.fromfile(f, dtype="i4", count=1)
         # Br, Bp, Bz
         nrpz = 3 * nr * nphi * nz
-        Br = []
-        Bp = []
-        Bz = []
-        for i in range(nextcur):
+        if mmap:
+            (nbytes,) = np.fromfile(f, dtype="i4", count=1)
+            assert nbytes == nrpz * 8, "B was not written as 'f8'. Try f{:}".format(
+                nbytes // nrpz
+            )
+            Bgroup = _MgridRecords(
+                filename, f.tell(), (nextcur, nr, nz, nphi), style_2000
+            )
+            # skip the records
+            f.seek(f.tell() - 4 + nextcur * (nrpz * 8 + 8))
+            nextcur_read = 0
+        else:
+            Bgroup = np.empty((nextcur, 3, nr, nz, nphi), dtype=dtype)
+            nextcur_read = nextcur
+        for i in range(nextcur_read):
             (nbytes,) = np.fromfile(f, dtype="i4", count=1)
             assert nbytes == nrpz * 8, "B was not written as 'f8'. Try f{:}".format(
                 nbytes // nrpz
             )
             B = np.fromfile(f, dtype="f8", count=nrpz)
+            Bvec = B.reshape((nphi, nz, nr, 3)).T
             if style_2000:
-                Bvec = B.reshape((nphi, nz, nr, 3)).T
-                Br.append(Bvec[0])
-                Bp.append(Bvec[1])
-                Bz.append(Bvec[2])
+                # (Br, Bp, Bz)
+                Bgroup[i] = Bvec[[0, 2, 1]]
             else:
-                Bvec = B.reshape((nphi, nz, nr, 3)).T
-                Br.append(Bvec[0])
-                Bz.append(Bvec[1])
-                Bp.append(Bvec[2])
+                # (Br, Bz, Bp)
+                Bgroup[i] = Bvec
             (nbytes,) = np.fromfile(f, dtype="i4", count=1)
         # mgrid_mode, "S" or "N"
         if style_2000:
@@ -73,7 +119,9 @@ class Mgrid(object):
             assert (
                 nbytes == 8 * nextcur
             ), "Real was not written as 'f8'. Try f{:}".format(nbytes // nextcur)
-            extcur = np.fromfile(f, dtype="f8", count=nextcur)
+            raw_extcur = np.fromfile(f, dtype="f8", count=nextcur)
+            if extcur is None:
+                extcur = raw_extcur
         else:
             mgrid_mode = "N"
         f.close()
@@ -88,96 +136,489 @@ class Mgrid(object):
         zz = np.linspace(zmin, zmax, nz)
         phi = np.linspace(0, 2 * np.pi / nfp, nphi + 1)
         # sum data
-        Br_total = np.zeros((nr, nz, nphi + 1))
-        Bz_total = np.zeros((nr, nz, nphi + 1))
-        Bp_total = np.zeros((nr, nz, nphi + 1))
-        for i in range(nextcur):
-            Br_total[:, :, :-1] += Br[i] * extcur[i]
-            Bz_total[:, :, :-1] += Bz[i] * extcur[i]
-            Bp_total[:, :, :-1] += Bp[i] * extcur[i]
-        # add one additional toroidal cross-section
-        Br_total[:, :, -1] = Br_total[:, :, 0]
-        Bz_total[:, :, -1] = Bz_total[:, :, 0]
-        Bp_total[:, :, -1] = Bp_total[:, :, 0]
+        Btot = _sum_groups(Bgroup, extcur)
         return cls(
-            r=rr, z=zz, phi=phi, Br=Br_total, Bz=Bz_total, Bphi=Bp_total, nfp=nfp
+            r=rr,
+            z=zz,
+            phi=phi,
+            Br=Btot[0],
+            Bz=Btot[1],
+            Bphi=Btot[2],
+            nfp=nfp,
+            Bgroup=Bgroup,
+            extcur=np.asarray(extcur, dtype=float),
+            curlabel=[label.decode().strip() for label in curlabel],
         )
 
-    def interpolate(self, **kwargs):
-        from scipy.interpolate import RegularGridInterpolator
+    def set_extcur(self, extcur):
+        """Change the group currents; the totals are a linear combination of `self.Bgroup`.
 
-        self.Br_func = RegularGridInterpolator(
-            (self.r, self.z, self.phi), self.Br, bounds_error=False, fill_value=0
-        )
-        self.Bz_func = RegularGridInterpolator(
-            (self.r, self.z, self.phi), self.Bz, bounds_error=False, fill_value=0
-        )
-        self.Bphi_func = RegularGridInterpolator(
-            (self.r, self.z, self.phi), self.Bphi, bounds_error=False, fill_value=0
+        Args:
+            extcur (array_like): Current of every group.
+        """
+        assert self.Bgroup is not None, "The per-group fields are not available."
+        assert len(extcur) == len(self.Bgroup), "len(extcur) != nextcur"
+        self.extcur = np.asarray(extcur, dtype=float)
+        self.Br, self.Bz, self.Bphi = _sum_groups(self.Bgroup, self.extcur)
+        self.interpolate()
+        return
+
+    @classmethod
+    def from_coils(
+        cls,
+        coil,
+        rmin,
+        rmax,
+        zmin,
+        zmax,
+        nr,
+        nz,
+        nphi,
+        nfp=None,
+        nthreads=1,
+        backend=None,
+        chunk=None,
+    ):
+        """Compute the mgrid of a coil set, like MAKEGRID.
+
+        The field of every current group is evaluated on one field period with
+        `Coil.bfield_HH`, so `nthreads` and `backend` select the Biot-Savart kernel.
+        Each group is stored per unit current of its first coil with a non-zero
+        current, and that current is saved as `extcur` (MAKEGRID "S" mode). A group
+        without currents is stored with unit currents and extcur=0.
+
+        Args:
+            coil (Coil): Coil set (a `SymmetricCoil` only evaluates its unique coils).
+            rmin (float): Minimum major radius.
+            rmax (float): Maximum major radius.
+            zmin (float): Minimum vertical position.
+            zmax (float): Maximum vertical position.
+            nr (int): Number of radial grid points.
+            nz (int): Number of vertical grid points.
+            nphi (int): Number of toroidal cross-sections in one field period.
+            nfp (int, optional): Number of field periods. Defaults to None, `coil.nfp`
+                for a `SymmetricCoil` and 1 otherwise.
+            nthreads (int, optional): Number of threads. Defaults to 1.
+            backend (str, optional): Biot-Savart backend. Defaults to None (the default).
+            chunk (int, optional): Number of points evaluated per block. Defaults to None.
+
+        Returns:
+            Mgrid: The mgrid with the per-group fields.
+        """
+        from copy import copy
+
+        if nfp is None:
+            nfp = getattr(coil, "nfp", 1)
+        rr = np.linspace(rmin, rmax, nr)
+        zz = np.linspace(zmin, zmax, nz)
+        phi = np.linspace(0, 2 * np.pi / nfp, nphi + 1)
+        R, Z, P = np.meshgrid(rr, zz, phi[:-1], indexing="ij")
+        pos = np.transpose([R * np.cos(P), R * np.sin(P), Z], (1, 2, 3, 0))
+        cosp, sinp = np.cos(P), np.sin(P)
+        groups = [icoil.group for icoil in coil.data]
+        unique, first = np.unique(groups, return_index=True)
+        Bgroup = np.empty((len(unique), 3, nr, nz, nphi))
+        extcur = np.zeros(len(unique))
+        curlabel = []
+        for i, igroup in enumerate(unique):
+            curlabel.append(str(coil.data[first[i]].name))
+            members = [icoil for icoil in coil.data if icoil.group == igroup]
+            currents = [icoil.I for icoil in members if icoil.I != 0]
+            extcur[i] = currents[0] if currents else 0.0
+            # the group with currents relative to its first non-zero current
+            sub = copy(coil)
+            sub.data = []
+            for icoil in members:
+                icoil = copy(icoil)
+                icoil.I = icoil.I / extcur[i] if extcur[i] != 0 else 1.0
+                sub.data.append(icoil)
+            sub.num = len(sub.data)
+            sub._response = None
+            B = sub.bfield_HH(
+                pos.reshape((-1, 3)), chunk=chunk, nthreads=nthreads, backend=backend
+            ).reshape(pos.shape)
+            Bgroup[i, 0] = B[..., 0] * cosp + B[..., 1] * sinp
+            Bgroup[i, 1] = B[..., 2]
+            Bgroup[i, 2] = B[..., 1] * cosp - B[..., 0] * sinp
+        Btot = _sum_groups(Bgroup, extcur)
+        return cls(
+            r=rr,
+            z=zz,
+            phi=phi,
+            Br=Btot[0],
+            Bz=Btot[1],
+            Bphi=Btot[2],
+            nfp=nfp,
+            Bgroup=Bgroup,
+            extcur=extcur,
+            curlabel=curlabel,
         )
+
+    def write_mgrid_bin(self, filename, style_2000=True, mgrid_mode="S"):
+        """Write the per-group fields in the binary mgrid format.
+
+        Args:
+            filename (str): File name and path.
+            style_2000 (bool, optional): Write the 2000-style layout, with (Br,Bphi,Bz),
+                `mgrid_mode` and `self.extcur`. Otherwise the old layout with (Br,Bz,Bphi)
+                is written. Defaults to True.
+            mgrid_mode (str, optional): "S" (scaled) or "R" (raw). Defaults to "S".
+        """
+        assert self.Bgroup is not None, "The per-group fields are not available."
+        nextcur, _, nr, nz, nphi = np.shape(self.Bgroup)
+        curlabel = self.curlabel
+        if curlabel is None:
+            curlabel = ["group_{:d}".format(i + 1) for i in range(nextcur)]
+        header = [nr, nz, nphi, self.nfp, -nextcur if style_2000 else nextcur]
+        order = [0, 2, 1] if style_2000 else [0, 1, 2]
+        with open(filename, "wb") as f:
+            _write_record(f, np.array(header, dtype="i4"))
+            rz = [self.r[0], self.z[0], self.r[-1], self.z[-1]]
+            _write_record(f, np.array(rz, dtype="f8"))
+            _write_record(f, np.array(curlabel, dtype="S30"))
+            for i in range(nextcur):
+                # the components of each point are contiguous, B(3,nr,nz,nphi)
+                Bvec = self.Bgroup[i][order]
+                _write_record(f, np.asarray(Bvec.T, dtype="f8"))
+            if style_2000:
+                _write_record(f, np.array(mgrid_mode, dtype="S1"))
+                _write_record(f, np.asarray(self.extcur, dtype="f8"))
+        return
+
+    def interpolate(self, order=None):
+        """Prepare the interpolation of the total field.
+
+        The three components are stacked into one (nr*nz*nphi,3) table on the uniform
+        grid and interpolated together, periodically in phi. Points outside of the
+        radial or vertical range give zero field.
+
+        Args:
+            order (int, optional): 1 for trilinear or 3 for tricubic (Catmull-Rom)
+                interpolation. Defaults to None, keeping the current order.
+        """
+        if order is not None:
+            assert order in (1, 3), "Only the orders 1 and 3 are supported."
+            self.order = order
+        nr, nz, nphi = len(self.r), len(self.z), len(self.phi) - 1
+        dr = (self.r[-1] - self.r[0]) / (nr - 1)
+        dz = (self.z[-1] - self.z[0]) / (nz - 1)
+        assert np.allclose(np.diff(self.r), dr), "The radial grid is not uniform."
+        assert np.allclose(np.diff(self.z), dz), "The vertical grid is not uniform."
+        self._origin = np.array([self.r[0], self.z[0], 0.0])
+        self._spacing = np.array([dr, dz, 2 * np.pi / self.nfp / nphi])
+        self._upper = np.array([self.r[-1], self.z[-1]])
+        # phi is periodic, pad the cross-sections (-1, 0, ..., nphi+1) for the stencils
+        self._shape = np.array([nr, nz, nphi + 3])
+        pad = np.arange(-1, nphi + 2) % nphi
+        self._Btable = np.stack(
+            [self.Br[:, :, pad], self.Bz[:, :, pad], self.Bphi[:, :, pad]], axis=-1
+        ).reshape((-1, 3))
+        # offsets of the stencil in the table, for single points
+        k = np.arange(self.order + 1)
+        self._stencil = ((k[:, None, None] * nz + k[:, None]) * (nphi + 3) + k).ravel()
         return
 
     def bfield(self, rzp):
-        rzp[2] = rzp[2] % (2 * np.pi / self.nfp)
-        Br = self.Br_func(rzp)
-        Bz = self.Bz_func(rzp)
-        Bphi = self.Bphi_func(rzp)
-        return np.array([Br, Bz, Bphi])
-
-    def tracing(self, r0, z0, phi0=0.0, niter=100, **kwargs):
-        from scipy.integrate import solve_ivp
-        from .misc import print_progress
-
-        def fieldline(phi, rz):
-            rzp = np.array([rz[0], rz[1], phi])
-            B = np.ravel(self.bfield(rzp))
-            return [B[0] / B[2] * rz[0], B[1] / B[2] * rz[0]]
-
-        dphi = 2 * np.pi / self.nfp
-        phi = phi0 + dphi * np.arange(niter)
-        nlines = len(r0)
-        lines = []
-        for i in range(nlines):
-            points = [[r0[i], z0[i]]]
-            for j in range(niter):
-                print_progress(i * niter + j, nlines * niter)
-                phi_start = phi[j]
-                sol = solve_ivp(
-                    fieldline,
-                    (phi_start, phi_start + dphi),
-                    points[j],
-                    method="LSODA",
-                    **kwargs
-                )
-                points.append(sol.y[:, -1])
-            lines.append(np.array(points))
-        return lines
-
-    def poincare_plot(self, r0, z0, phi0=0.0, niter=100, color=None, **kwargs):
-        import matplotlib.pyplot as plt
-        from matplotlib import cm
-
-        # get figure and ax data
-        if plt.get_fignums():
-            fig = plt.gcf()
-            ax = plt.gca()
-        else:
-            fig, ax = plt.subplots()
+        """Interpolate the field in cylindrical coordinates.
+
+        Args:
+            rzp (array_like): Points (R,Z,phi), shape (3,) or (3,n).
+
+        Returns:
+            numpy.ndarray: (Br,Bz,Bphi), shape (3,n), n=1 for a single point.
+        """
+        rzp = np.asarray(rzp, dtype=float)
+        if rzp.shape == (3,):
+            B = self._bfield_point(*rzp.tolist())
+            if B is not None:
+                return B
+        rzp = np.reshape(rzp, (3, -1)).T
+        nz, npad = self._shape[1:]
+        # fractional grid indices, (n,3)
+        t = (rzp - self._origin) / self._spacing
+        t[:, 2] %= len(self.phi) - 1
+        i = np.floor(t)
+        f = t - i
+        stencil = np.arange(2) if self.order == 1 else np.arange(-1, 3)
+        weight = np.stack(_weights(f, self.order), axis=-1)
+        # stencil indices (n,3,order+1), the edges in R and Z are replicated
+        i = i.astype(int)[:, :, None] + stencil
+        i[:, 2] += 1
+        i = np.clip(i, 0, self._shape[:, None] - 1)
+        index = (i[:, 0, :, None, None] * nz + i[:, 1, None, :, None]) * npad
+        index = (index + i[:, 2, None, None, :]).reshape((len(t), -1))
+        weight = (
+            weight[:, 0, :, None, None]
+            * weight[:, 1, None, :, None]
+            * weight[:, 2, None, None, :]
+        ).reshape((len(t), 1, -1))
+        B = np.matmul(weight, self._Btable[index])[:, 0].T
+        # no field outside of the grid
+        outside = (rzp[:, :2] < self._origin[:2]) | (rzp[:, :2] > self._upper)
+        B[:, np.any(outside, axis=1)] = 0.0
+        return B
+
+    def _bfield_point(self, r, z, phi):
+        """`self.bfield` of a single point on scalars, None near the R,Z edges."""
+        r0, z0 = self._origin[:2].tolist()
+        rmax, zmax = self._upper.tolist()
+        if not (r0 <= r <= rmax and z0 <= z <= zmax):
+            return np.zeros((3, 1))
+        dr, dz, dphi = self._spacing.tolist()
+        nr, nz, npad = self._shape.tolist()
+        t = [(r - r0) / dr, (z - z0) / dz, (phi / dphi) % (npad - 3)]
+        i = [math.floor(x) for x in t]
+        # first stencil index in the table, phi is padded by one cross-section
+        low = 0 if self.order == 1 else -1
+        first = [i[0] + low, i[1] + low, i[2] + 1 + low]
+        last = [x + self.order for x in first]
+        if min(first) < 0 or last[0] >= nr or last[1] >= nz or last[2] >= npad:
+            return None
+        wr, wz, wphi = [_weights(x - y, self.order) for x, y in zip(t, i)]
+        weight = np.multiply.outer(np.multiply.outer(wr, wz), wphi).ravel()
+        index = (first[0] * nz + first[1]) * npad + first[2] + self._stencil
+        return np.matmul(weight, self._Btable[index])[:, np.newaxis]
+
+    def tracing(self, r0, z0, phi0=0.0, niter=100, nstep=None, nprocs=1):
+        """Trace field lines and record their crossings of the toroidal section.
+
+        All the field lines are advanced together as one state with a fixed-step RK4
+        in phi, dR/dphi = R Br/Bphi and dZ/dphi = R Bz/Bphi, evaluating `self.bfield`
+        on the whole batch. Lines leaving the grid are stopped and their later
+        crossings are NaN.
+
+        Args:
+            r0 (array_like): Starting major radii.
+            z0 (array_like): Starting vertical positions.
+            phi0 (float, optional): Toroidal angle of the starting points, where the
+                crossings are recorded. Defaults to 0.0.
+            niter (int, optional): Number of field periods. Defaults to 100.
+            nstep (int, optional): RK4 steps per field period. Defaults to None,
+                four steps per toroidal grid spacing.
+            nprocs (int, optional): Number of processes, the lines are split between
+                them. The processes are spawned, so a calling script needs the
+                `if __name__ == "__main__":` guard. Defaults to 1.
+
+        Returns:
+            numpy.ndarray: (R,Z) of every crossing, (nlines,niter+1,2).
+        """
+        rz = np.transpose([np.ravel(r0), np.ravel(z0)]).astype(float)
+        if nstep is None:
+            nstep = 4 * (len(self.phi) - 1)
+        if nprocs <= 1 or len(rz) < 2:
+            return _trace_lines(self, rz, phi0, niter, nstep)
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from copy import copy
+
+        # only the interpolation table is needed by the workers
+        mgrid = copy(self)
+        mgrid.Bgroup = None
+        blocks = np.array_split(rz, min(nprocs, len(rz)))
+        args = [(mgrid, block, phi0, niter, nstep) for block in blocks]
+        # forking a process with running kernel threads (e.g. numba) may deadlock
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=nprocs, mp_context=context) as pool:
+            results = list(pool.map(_trace_lines, *zip(*args)))
+        return np.concatenate(results)
+
+    def poincare(
+        self, r0, z0, phi0=0.0, niter=100, nstep=None, nprocs=1, filename=None
+    ):
+        """Poincare crossings of field lines, optionally cached in a file.
+
+        If `filename` holds the crossings of the same field, section and starting
+        points, only the missing transits are traced and the file is updated.
+
+        Args:
+            r0 (array_like): Starting major radii.
+            z0 (array_like): Starting vertical positions.
+            phi0 (float, optional): Toroidal angle of the section. Defaults to 0.0.
+            niter (int, optional): Number of field periods. Defaults to 100.
+            nstep (int, optional): RK4 steps per field period. Defaults to None,
+                see `self.tracing`.
+            nprocs (int, optional): Number of processes. Defaults to 1.
+            filename (str, optional): Cache file (.npz). Defaults to None.
+
+        Returns:
+            Poincare: The crossings, possibly more than `niter` transits from the cache.
+        """
+        import hashlib
+        import os
+        from .poincare import Poincare
+
+        if nstep is None:
+            nstep = 4 * (len(self.phi) - 1)
+        start = np.transpose([np.ravel(r0), np.ravel(z0)]).astype(float)
+        # the cache is keyed by the interpolated field and the integration
+        key = hashlib.sha1(np.ascontiguousarray(self._Btable))
+        key.update(np.array([*self._origin, *self._spacing, self.order, nstep]))
+        source = "mgrid:" + key.hexdigest()
+        data = None
+        if filename is not None and os.path.exists(filename):
+            data = Poincare.load(filename)
+            if not data.matches(source, start, phi0):
+                data = None
+        if data is None:
+            data = Poincare(start[:, None, :], source=source, phi0=phi0)
+        if data.niter < niter:
+            data.extend(
+                lambda rz, n: self.tracing(
+                    rz[:, 0], rz[:, 1], phi0, n, nstep=nstep, nprocs=nprocs
+                ),
+                niter,
+            )
+            if filename is not None:
+                data.save(filename)
+        return data
+
+    def poincare_plot(
+        self,
+        r0,
+        z0,
+        phi0=0.0,
+        niter=100,
+        color=None,
+        filename=None,
+        nstep=None,
+        nprocs=1,
+        **kwargs
+    ):
+        """Poincare plot of field lines, see `self.poincare`.
+
+        Args:
+            r0 (array_like): Starting major radii.
+            z0 (array_like): Starting vertical positions.
+            phi0 (float, optional): Toroidal angle of the section. Defaults to 0.0.
+            niter (int, optional): Number of field periods. Defaults to 100.
+            color (matplotlib color, or None): dot colors. Defaults to None (rainbow).
+            filename (str, optional): Cache file of the crossings. Defaults to None.
+            nstep (int, optional): RK4 steps per field period. Defaults to None,
+                see `self.tracing`.
+            nprocs (int, optional): Number of processes. Defaults to 1.
+            kwargs : matplotlib scatter keyword arguments
+
+        Returns:
+            matplotlib.collections.PathCollection: The scatter collection.
+        """
+        data = self.poincare(
+            r0, z0, phi0, niter, nstep=nstep, nprocs=nprocs, filename=filename
+        )
+        return data.plot(color=color, **kwargs)
+
+
+def _write_record(f, data):
+    """Write an array as one Fortran unformatted sequential record."""
+    data = np.ascontiguousarray(data)
+    marker = np.array([data.nbytes], dtype="i4")
+    marker.tofile(f)
+    data.tofile(f)
+    marker.tofile(f)
+    return
+
+
+def _weights(f, order):
+    """Interpolation weights of the stencil at the fraction f (scalar or array)."""
+    if order == 1:
+        return [1 - f, f]
+    # Catmull-Rom cubic convolution
+    f2 = f * f
+    f3 = f2 * f
+    return [
+        0.5 * (-f3 + 2 * f2 - f),
+        0.5 * (3 * f3 - 5 * f2 + 2),
+        0.5 * (-3 * f3 + 4 * f2 + f),
+        0.5 * (f3 - f2),
+    ]
+
+
+def _sum_groups(Bgroup, extcur):
+    """Total field (Br,Bz,Bphi) of the groups, with the repeated toroidal cross-section."""
+    nextcur, _, nr, nz, nphi = np.shape(Bgroup)
+    Btot = np.zeros((3, nr, nz, nphi + 1))
+    if isinstance(Bgroup, np.ndarray) and not isinstance(Bgroup, np.memmap):
+        # in memory, one contraction over the groups
+        Btot[:, :, :, :-1] = np.tensordot(np.asarray(extcur, dtype=float), Bgroup, 1)
+        Btot[:, :, :, -1] = Btot[:, :, :, 0]
+        return Btot
+    for i in range(nextcur):
+        if extcur[i] == 0:
+            continue
+        # one toroidal cross-section at a time, memory-mapped groups are decoded lazily
+        for k in range(nphi):
+            Btot[:, :, :, k] += Bgroup[i, :, :, :, k] * extcur[i]
+    # add one additional toroidal cross-section
+    Btot[:, :, :, -1] = Btot[:, :, :, 0]
+    return Btot
+
+
+def _trace_lines(mgrid, rz, phi0, niter, nstep):
+    """Fixed-step RK4 of the field lines (n,2) starting at phi0, see `Mgrid.tracing`."""
+
+    def fieldline(phi, rz):
+        rzp = [rz[:, 0], rz[:, 1], np.full(len(rz), phi)]
+        B = mgrid.bfield(rzp)
+        return (rz[:, 0] * B[:2] / B[2]).T
+
+    h = 2 * np.pi / mgrid.nfp / nstep
+    lines = np.full((len(rz), niter + 1, 2), np.nan)
+    lines[:, 0] = rz
+    alive = np.all(np.isfinite(rz), axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for j in range(niter):
+            y = lines[alive, j]
+            for k in range(nstep):
+                phi = phi0 + j * nstep * h + k * h
+                k1 = fieldline(phi, y)
+                k2 = fieldline(phi + h / 2, y + h / 2 * k1)
+                k3 = fieldline(phi + h / 2, y + h / 2 * k2)
+                k4 = fieldline(phi + h, y + h * k3)
+                y = y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+            lines[alive, j + 1] = y
+            # stop the lines that left the grid
+            alive &= np.all(np.isfinite(lines[:, j + 1]), axis=1)
+            lines[~alive, j + 1] = np.nan
+            if not np.any(alive):
+                break
+    return lines
+
+
+class _MgridRecords(object):
+    """Read-only view of the per-group records of a memory-mapped mgrid file.
+
+    Indexing works like an array of shape (nextcur,3,nr,nz,nphi) with the components
+    (Br,Bz,Bphi); only the indexed part is decoded.
+    """
+
+    def __init__(self, filename, offset, shape, style_2000):
+        nextcur, nr, nz, nphi = shape
+        self.shape = (nextcur, 3, nr, nz, nphi)
+        self.dtype = np.dtype("f8")
+        self.order = [0, 2, 1] if style_2000 else [0, 1, 2]
+        nrpz = 3 * nr * nz * nphi
+        data = np.memmap(filename, dtype="u1", mode="r")
+        # every record is surrounded by two 4-byte markers
+        self.records = np.ndarray(
+            (nextcur, nphi, nz, nr, 3),
+            dtype=self.dtype,
+            buffer=data,
+            offset=offset,
+            strides=(nrpz * 8 + 8, nz * nr * 24, nr * 24, 24, 8),
+        )
+
+    def __len__(self):
+        return self.shape[0]
 
-        data = self.tracing(r0, z0, phi0, niter)
-        ns = len(data)
-        # get colors
-        if color is None:
-            colors = cm.rainbow(np.linspace(1, 0, ns))
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (5 - len(key))
+        if isinstance(key[0], slice):
+            groups = self.records[key[0]]
         else:
-            colors = [color] * ns
-        kwargs["s"] = kwargs.get("s", 0.1)  # dotsize
-        # scatter plot
-        for i in range(ns):
-            ax.scatter(data[i][:, 0], data[i][:, 1], color=colors[i], **kwargs)
-        plt.axis("equal")
-        plt.xlabel("R [m]", fontsize=20)
-        plt.ylabel("Z [m]", fontsize=20)
-        plt.xticks(fontsize=16)
-        plt.yticks(fontsize=16)
-        return
\ No newline at end of file
+            i = range(self.shape[0])[key[0]]
+            groups = self.records[i : i + 1]
+        # select the points before reordering the components, (m,3,nr,nz,nphi)
+        groups = np.transpose(groups, (0, 4, 3, 2, 1))[(slice(None),) * 2 + key[2:]]
+        groups = groups[:, self.order][:, key[1]]
+        return groups if isinstance(key[0], slice) else groups[0]
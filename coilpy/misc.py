@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import numpy as np
 import sys
 
@@ -182,19 +183,20 @@ def trigfft(y, tr=-1):
     """calculate trigonometric coefficients using FFT
     Assuming the periodicity is 2*pi
     params:
-        y -- 1D array for Fourier transformation
+        y -- 1D array for Fourier transformation, or a stack of them (..., N)
         tr -- Truncation number (default: -1)
     return:
         a dict containing
         'n' -- index
-        'rcos' -- cos coefficients of the real part
-        'rsin' -- sin coefficients of the real part
-        'icos' -- cos coefficients of the imag part
-        'isin' -- sin coefficients of the imag part
+        'rcos' -- cos coefficients of the real part, (..., tr)
+        'rsin' -- sin coefficients of the real part, (..., tr)
+        'icos' -- cos coefficients of the imag part, (..., tr)
+        'isin' -- sin coefficients of the imag part, (..., tr)
     """
     from scipy.fftpack import fft
 
-    N = len(y)
+    y = np.asarray(y)
+    N = y.shape[-1]
     if N % 2 == 0:  # even
         half = N // 2 - 1
         end = half + 2
@@ -202,23 +204,24 @@ def trigfft(y, tr=-1):
         half = (N - 1) // 2
         end = half + 1
     assert tr <= end, "Truncation number should be smaller than dimension!"
-    comp = fft(y) / N
-    a_k = np.zeros(end, dtype=np.complex)
-    b_k = np.zeros(end, dtype=np.complex)
-    a_k[0] = comp[0]
-    for n in range(1, half + 1):
-        a_k[n] = comp[n] + comp[N - n]
-        b_k[n] = (comp[n] - comp[N - n]) * 1j
+    comp = fft(y, axis=-1) / N
+    a_k = np.zeros(y.shape[:-1] + (end,), dtype=complex)
+    b_k = np.zeros(y.shape[:-1] + (end,), dtype=complex)
+    # map n and N-n onto the cos and sin coefficients
+    n = np.arange(1, half + 1)
+    a_k[..., 0] = comp[..., 0]
+    a_k[..., n] = comp[..., n] + comp[..., N - n]
+    b_k[..., n] = (comp[..., n] - comp[..., N - n]) * 1j
     if N % 2 == 0:  # even number
-        a_k[end - 1] = comp[N // 2]
+        a_k[..., end - 1] = comp[..., N // 2]
     index = np.arange(end)
 
     return {
         "n": index[:tr],
-        "rcos": np.real(a_k[:tr]),
-        "rsin": np.real(b_k[:tr]),
-        "icos": np.imag(a_k[:tr]),
-        "isin": np.imag(b_k[:tr]),
+        "rcos": np.real(a_k[..., :tr]),
+        "rsin": np.real(b_k[..., :tr]),
+        "icos": np.imag(a_k[..., :tr]),
+        "isin": np.imag(b_k[..., :tr]),
     }
 
 
@@ -226,21 +229,22 @@ def trigfft2(y):
     """calculate trigonometric coefficients using FFT
     Assuming the periodicity is 2*pi
     params:
-        y -- 2D array for Fourier transformation
+        y -- 2D array for Fourier transformation, or a stack of them (..., M, N)
     return:
         a dict containing
         'n' -- 1D array, n index
         'm' -- 1D array, m index
-        'rcos' -- 2D array, cos coefficients of the real part
-        'rsin' -- 2D array, sin coefficients of the real part
-        'icos' -- 2D array, cos coefficients of the imag part
-        'isin' -- 2D array, sin coefficients of the imag part
+        'rcos' -- 2D array, cos coefficients of the real part, (..., m, n)
+        'rsin' -- 2D array, sin coefficients of the real part, (..., m, n)
+        'icos' -- 2D array, cos coefficients of the imag part, (..., m, n)
+        'isin' -- 2D array, sin coefficients of the imag part, (..., m, n)
     """
     from scipy.fftpack import fft2, fftshift
 
-    M, N = y.shape
+    y = np.asarray(y)
+    M, N = y.shape[-2:]
     mn = M * N
-    comp = fft2(y) / mn
+    comp = fft2(y, axes=(-2, -1)) / mn
     if M % 2 == 0:  # even
         half = M // 2 - 1
         end = half + 2
@@ -257,25 +261,23 @@ def trigfft2(y):
         start = 0
         nmin = -(N - 1) // 2
         nmax = (N - 1) // 2
-    a_k = np.zeros((end, N), dtype=np.complex)
-    b_k = np.zeros((end, N), dtype=np.complex)
-    # find mapping
-    a_k[0, 0] = comp[0, 0]
-    for n in range(1, N):
-        a_k[0, n] = comp[0, n] + comp[0, N - n]
-        b_k[0, n] = (comp[0, n] - comp[0, N - n]) * 1j
-    for m in range(1, (M + 1) // 2):
-        a_k[m, 0] = comp[m, 0] + comp[M - m, 0]
-        b_k[m, 0] = (comp[m, 0] - comp[M - m, 0]) * 1j
-        for n in range(1, N):
-            a_k[m, n] = comp[m, n] + comp[M - m, N - n]
-            b_k[m, n] = (comp[m, n] - comp[M - m, N - n]) * 1j
+    a_k = np.zeros(y.shape[:-2] + (end, N), dtype=complex)
+    b_k = np.zeros(y.shape[:-2] + (end, N), dtype=complex)
+    # find mapping, (m,n) and (M-m,N-n)
+    m = np.arange(half + 1)[:, None]
+    n = np.arange(N)
+    comp_p = comp[..., m, n]
+    comp_m = comp[..., (M - m) % M, (N - n) % N]
+    a_k[..., : half + 1, :] = comp_p + comp_m
+    b_k[..., : half + 1, :] = (comp_p - comp_m) * 1j
+    a_k[..., 0, 0] = comp[..., 0, 0]
+    b_k[..., 0, 0] = 0
     if M % 2 == 0 and N % 2 == 0:  # even
-        a_k[end - 1, N // 2] = comp[M // 2, N // 2]
-    a_k = fftshift(a_k, axes=1)
-    b_k = fftshift(b_k, axes=1)
-    a_k[0, start:mid0] = 0 + 1j * 0
-    b_k[0, start:mid0] = 0 + 1j * 0
+        a_k[..., end - 1, N // 2] = comp[..., M // 2, N // 2]
+    a_k = fftshift(a_k, axes=-1)
+    b_k = fftshift(b_k, axes=-1)
+    a_k[..., 0, start:mid0] = 0 + 1j * 0
+    b_k[..., 0, start:mid0] = 0 + 1j * 0
     mm = np.arange(end)
     nn = np.arange(nmin, nmax + 1)
     return {
@@ -338,21 +340,34 @@ def _trig2real_1d(theta, xm, fmnc=None, fmns=None):
 
 
 def _trig2real_2d(theta, zeta, xm, xn, fmnc=None, fmns=None):
-    npol, ntor = len(theta), len(zeta)
-    _tv, _zv = np.meshgrid(theta, zeta, indexing="ij")
-    # mt - nz (in matrix)
-    _mtnz = np.matmul(np.reshape(xm, (-1, 1)), np.reshape(_tv, (1, -1))) - np.matmul(
-        np.reshape(xn, (-1, 1)), np.reshape(_zv, (1, -1))
-    )
-    _cos = np.cos(_mtnz)
-    _sin = np.sin(_mtnz)
-
-    f = np.zeros((1, npol * ntor))
+    return _trig_series(_trig_tables(theta, zeta, xm, xn), fmnc, fmns)
+
+
+def _trig_tables(theta, zeta, xm, xn):
+    """cos/sin of the distinct m and n, (m,npol) and (n,ntor), for `_trig_series`"""
+    _m, _im = np.unique(np.ravel(xm), return_inverse=True)
+    _n, _in = np.unique(np.ravel(xn), return_inverse=True)
+    _mt = np.reshape(_m, (-1, 1)) * np.ravel(theta)
+    _nz = np.reshape(_n, (-1, 1)) * np.ravel(zeta)
+    return (_im, _in, np.cos(_mt), np.sin(_mt), np.cos(_nz), np.sin(_nz))
+
+
+def _trig_series(tables, fmnc=None, fmns=None):
+    """Sum of fmnc*cos(mt-nz) + fmns*sin(mt-nz) on the tables from `_trig_tables`"""
+    # cos(mt-nz) = cos(mt)cos(nz) + sin(mt)sin(nz)
+    # sin(mt-nz) = sin(mt)cos(nz) - cos(mt)sin(nz)
+    # so only cos/sin of the distinct m and n are evaluated
+    _im, _in, _cosm, _sinm, _cosn, _sinn = tables
+    # coefficients on the (m,n) table
+    _c = np.zeros((len(_cosm), len(_cosn)))
+    _s = np.zeros((len(_cosm), len(_cosn)))
     if fmnc is not None:
-        f += np.matmul(np.reshape(fmnc, (1, -1)), _cos)
+        np.add.at(_c, (_im, _in), np.ravel(fmnc))
     if fmns is not None:
-        f += np.matmul(np.reshape(fmns, (1, -1)), _sin)
-    return f.reshape(npol, ntor)
+        np.add.at(_s, (_im, _in), np.ravel(fmns))
+    f = np.matmul(_cosm.T, np.matmul(_c, _cosn) - np.matmul(_s, _sinn))
+    f += np.matmul(_sinm.T, np.matmul(_c, _sinn) + np.matmul(_s, _cosn))
+    return f
 
 
 def real2trig_2d(f, xm, xn, theta, zeta):
@@ -372,6 +387,24 @@ def real2trig_2d(f, xm, xn, theta, zeta):
     assert (npol, ntor) == np.shape(
         f
     ), "F function dimension should be consistent with theta, zeta."
+    fac = 2.0 / (npol * ntor)
+    ind = np.logical_and(np.asarray(xm) == 0, np.asarray(xn) == 0)
+    # FFT on uniform periodic grids
+    _p = _fft_index(theta, xm)
+    _q = _fft_index(zeta, -np.asarray(xn))
+    if _p is not None and _q is not None:
+        # sum of f*exp(i(mt-nz)) is a (conjugated) DFT coefficient
+        F = np.fft.rfft2(f)
+        _p, _q = -_p % npol, -_q % ntor
+        # the other half of the spectrum is conjugate symmetric, f is real
+        half = _q <= ntor // 2
+        fmn = F[np.where(half, _p, -_p % npol), np.where(half, _q, -_q % ntor)]
+        fmn = np.where(half, fmn, np.conj(fmn))
+        fmn *= np.exp(1j * (np.asarray(xm) * theta[0] - np.asarray(xn) * zeta[0]))
+        fmnc, fmns = fmn.real, fmn.imag
+        fmnc[ind] *= 0.5
+        fmns[ind] *= 0.5
+        return fmnc * fac, fmns * fac
     _tv, _zv = np.meshgrid(theta, zeta, indexing="ij")
     # mt - nz (in matrix)
     _mtnz = np.matmul(np.reshape(xm, (-1, 1)), np.reshape(_tv, (1, -1))) - np.matmul(
@@ -382,14 +415,31 @@ def real2trig_2d(f, xm, xn, theta, zeta):
 
     fmnc = np.ravel(np.matmul(_cos, f.reshape(-1, 1)))
     fmns = np.ravel(np.matmul(_sin, f.reshape(-1, 1)))
-    fac = 2.0 / (npol * ntor)
     # m=0, n=0 term or m=0 terms?
-    ind = np.logical_and(xm == 0, xn == 0)
     fmnc[ind] *= 0.5
     fmns[ind] *= 0.5
     return fmnc * fac, fmns * fac
 
 
+def _fft_index(angle, modes):
+    """DFT index k of exp(i*modes*angle) on a uniform periodic grid, or None.
+
+    The grid is uniform if angle[j] = angle[0] + j*d and modes*d*len(angle) are all
+    multiples of 2*pi, so that exp(i*modes*angle[j]) = exp(i*modes*angle[0]) *
+    exp(2*pi*i*k*j/len(angle)).
+    """
+    angle = np.ravel(angle)
+    if len(angle) < 2:
+        return None
+    d = (angle[-1] - angle[0]) / (len(angle) - 1)
+    if not np.allclose(np.diff(angle), d, rtol=0, atol=1e-12 * (1 + abs(d))):
+        return None
+    k = np.asarray(modes, dtype=float) * d * len(angle) / (2 * np.pi)
+    if not np.allclose(k, np.round(k), rtol=0, atol=1e-8):
+        return None
+    return np.round(k).astype(int) % len(angle)
+
+
 def vmec2focus(
     vmec_file,
     focus_file="plasma.boundary",
@@ -708,15 +758,605 @@ def div0(a, b):
     return np.divide(a, b, out=np.zeros_like(a), where=b != 0)
 
 
-def biot_savart(pos, xyz, current, dxyz=None):
-    from coilpy_fortran import hanson_hirshman, biot_savart
+def biot_savart(pos, xyz, current, dxyz=None, nthreads=1, backend=None):
+    """Magnetic field of a single coil using the selected Biot-Savart backend.
 
+    The evaluation points are split across `nthreads` threads. See `set_backend`
+    for the available backends; the fastest one is used by default.
+
+    Args:
+        pos (ndarray, (n,3)): Evaluation points.
+        xyz (ndarray, (nseg,3)): Coil points.
+        current (float): Coil current.
+        dxyz (ndarray, (nseg,3), optional): Tangent times segment length. Defaults to None,
+            using the Hanson-Hirshman expression (the closing point should be repeated).
+        nthreads (int, optional): Number of threads. Defaults to 1.
+        backend (str, optional): Backend name. Defaults to None (see `get_backend`).
+
+    Returns:
+        ndarray, (n,3): Magnetic field at the evaluation points.
+    """
+    pos = np.atleast_2d(np.asarray(pos, dtype=float))
+    xyz = np.asarray(xyz, dtype=float)
+    kernels = get_backend(backend)
     if dxyz is None:
         # no tangent provided
-        return hanson_hirshman(pos, xyz, current)
+        return kernels["hanson_hirshman"](pos, xyz, current, nthreads=nthreads)
     else:
         # tangent provided
-        return biot_savart(pos, xyz, current, dxyz)
+        dxyz = np.asarray(dxyz, dtype=float)
+        return kernels["biot_savart"](pos, xyz, current, dxyz, nthreads=nthreads)
+
+
+def biot_savart_coils(
+    pos, xyz, offsets, currents, response=False, nthreads=1, backend=None
+):
+    """Magnetic field of a coil set in one call, using the Hanson-Hirshman expression.
+
+    All coils are passed as one packed array (see `coilpy.coils.Coil.pack`) to the
+    selected Biot-Savart backend.
+
+    Args:
+        pos (ndarray, (n,3)): Evaluation points.
+        xyz (ndarray, (npts,3)): Points of all coils, concatenated.
+        offsets (ndarray, (ncoil+1,)): Offset table, coil i is `xyz[offsets[i]:offsets[i+1]]`.
+        currents (ndarray, (ncoil,)): Coil currents.
+        response (bool, optional): Also return the field of every coil. Defaults to False.
+        nthreads (int, optional): Number of threads. Defaults to 1.
+        backend (str, optional): Backend name. Defaults to None (see `get_backend`).
+
+    Returns:
+        ndarray, (n,3): Total magnetic field at the evaluation points.
+        ndarray, (ncoil,n,3): Magnetic field of each coil, only if `response` is True.
+    """
+    pos = np.atleast_2d(np.asarray(pos, dtype=float))
+    xyz = np.asarray(xyz, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int32)
+    currents = np.asarray(currents, dtype=float)
+    kernels = get_backend(backend)
+    if not response:
+        return kernels["hanson_hirshman_coils"](
+            pos, xyz, offsets, currents, nthreads=nthreads
+        )
+    resp = kernels["hanson_hirshman_response"](
+        pos, xyz, offsets, currents, nthreads=nthreads
+    )
+    return np.sum(resp, axis=0), resp
+
+
+_BACKEND_ORDER = ("fortran", "numba", "numpy")
+_backends = {}
+_backend = None
+
+
+def _numpy_backend():
+    """Kernels of the NumPy backend, points are split on a thread pool."""
+
+    def hanson_hirshman(pos, xyz, current, nthreads=1):
+        return _threaded(
+            _hanson_hirshman_segments, pos, nthreads, xyz[:-1], xyz[1:], current
+        )
+
+    def biot_savart(pos, xyz, current, dxyz, nthreads=1):
+        return _threaded(_biot_savart_segments, pos, nthreads, xyz, dxyz, current)
+
+    def hanson_hirshman_coils(pos, xyz, offsets, currents, nthreads=1):
+        ri, rf, index = _packed_segments(xyz, offsets)
+        return _threaded(
+            _hanson_hirshman_segments, pos, nthreads, ri, rf, currents[index]
+        )
+
+    def hanson_hirshman_response(pos, xyz, offsets, currents, nthreads=1):
+        return np.array(
+            [
+                hanson_hirshman(
+                    pos, xyz[offsets[k] : offsets[k + 1]], currents[k], nthreads
+                )
+                for k in range(len(currents))
+            ]
+        ).reshape((len(currents), len(pos), 3))
+
+    def vector_potential_coils(pos, xyz, offsets, currents, nthreads=1):
+        ri, rf, index = _packed_segments(xyz, offsets)
+        return _threaded(
+            _vector_potential_segments, pos, nthreads, ri, rf, currents[index]
+        )
+
+    return locals()
+
+
+def _fortran_backend():
+    """Kernels of the compiled Fortran extension `coilpy_fortran` (OpenMP)."""
+    from coilpy_fortran import (
+        hanson_hirshman,
+        biot_savart,
+        hanson_hirshman_coils,
+        hanson_hirshman_response,
+        vector_potential_coils,
+    )
+
+    return locals()
+
+
+def _numba_backend():
+    """Kernels compiled with numba, points are split with `numba.prange`."""
+    from contextlib import contextmanager
+    import numba
+
+    @numba.njit(parallel=True, cache=True)
+    def _hanson_hirshman(pos, xyz, offsets, currents, out):
+        # out is (1,n,3) for the total field, (ncoil,n,3) for the field of each coil
+        per_coil = out.shape[0] > 1
+        for i in numba.prange(len(pos)):
+            x, y, z = pos[i, 0], pos[i, 1], pos[i, 2]
+            for k in range(len(currents)):
+                bx = by = bz = 0.0
+                for j in range(offsets[k], offsets[k + 1] - 1):
+                    rix, riy, riz = x - xyz[j, 0], y - xyz[j, 1], z - xyz[j, 2]
+                    rfx = x - xyz[j + 1, 0]
+                    rfy = y - xyz[j + 1, 1]
+                    rfz = z - xyz[j + 1, 2]
+                    lx, ly, lz = rix - rfx, riy - rfy, riz - rfz
+                    Ri = np.sqrt(rix * rix + riy * riy + riz * riz)
+                    Rf = np.sqrt(rfx * rfx + rfy * rfy + rfz * rfz)
+                    RiRf = Ri * Rf
+                    fac = (Ri + Rf) / (RiRf * (RiRf + rix * rfx + riy * rfy + riz * rfz))
+                    # Ri x Rf = l x Ri
+                    bx += (ly * riz - lz * riy) * fac
+                    by += (lz * rix - lx * riz) * fac
+                    bz += (lx * riy - ly * rix) * fac
+                m = k if per_coil else 0
+                out[m, i, 0] += bx * currents[k] * 1.0e-7
+                out[m, i, 1] += by * currents[k] * 1.0e-7
+                out[m, i, 2] += bz * currents[k] * 1.0e-7
+
+    @numba.njit(parallel=True, cache=True)
+    def _biot_savart(pos, xyz, dxyz):
+        B = np.zeros((len(pos), 3))
+        for i in numba.prange(len(pos)):
+            bx = by = bz = 0.0
+            for j in range(len(xyz)):
+                dx = pos[i, 0] - xyz[j, 0]
+                dy = pos[i, 1] - xyz[j, 1]
+                dz = pos[i, 2] - xyz[j, 2]
+                rm3 = (dx * dx + dy * dy + dz * dz) ** (-1.5)
+                bx += (dz * dxyz[j, 1] - dy * dxyz[j, 2]) * rm3
+                by += (dx * dxyz[j, 2] - dz * dxyz[j, 0]) * rm3
+                bz += (dy * dxyz[j, 0] - dx * dxyz[j, 1]) * rm3
+            B[i, 0] = bx
+            B[i, 1] = by
+            B[i, 2] = bz
+        return B * 1.0e-7
+
+    @numba.njit(parallel=True, cache=True)
+    def _vector_potential(pos, xyz, offsets, currents):
+        A = np.zeros((len(pos), 3))
+        for i in numba.prange(len(pos)):
+            x, y, z = pos[i, 0], pos[i, 1], pos[i, 2]
+            for k in range(len(currents)):
+                ax = ay = az = 0.0
+                for j in range(offsets[k], offsets[k + 1] - 1):
+                    lx = xyz[j + 1, 0] - xyz[j, 0]
+                    ly = xyz[j + 1, 1] - xyz[j, 1]
+                    lz = xyz[j + 1, 2] - xyz[j, 2]
+                    ll = np.sqrt(lx * lx + ly * ly + lz * lz)
+                    if ll == 0.0:
+                        # a repeated point, e.g. the closing point
+                        continue
+                    Ri = np.sqrt(
+                        (x - xyz[j, 0]) ** 2
+                        + (y - xyz[j, 1]) ** 2
+                        + (z - xyz[j, 2]) ** 2
+                    )
+                    Rf = np.sqrt(
+                        (x - xyz[j + 1, 0]) ** 2
+                        + (y - xyz[j + 1, 1]) ** 2
+                        + (z - xyz[j + 1, 2]) ** 2
+                    )
+                    fac = np.log((Ri + Rf + ll) / (Ri + Rf - ll)) / ll
+                    ax += fac * lx
+                    ay += fac * ly
+                    az += fac * lz
+                A[i, 0] += ax * currents[k]
+                A[i, 1] += ay * currents[k]
+                A[i, 2] += az * currents[k]
+        return A * 1.0e-7
+
+    @contextmanager
+    def _threads(nthreads):
+        # the thread count of the caller is restored afterwards
+        previous = numba.get_num_threads()
+        nthreads = min(int(nthreads), numba.config.NUMBA_NUM_THREADS)
+        numba.set_num_threads(max(nthreads, 1))
+        try:
+            yield
+        finally:
+            numba.set_num_threads(previous)
+
+    def hanson_hirshman(pos, xyz, current, nthreads=1):
+        offsets = np.array([0, len(xyz)], dtype=np.int32)
+        return hanson_hirshman_coils(pos, xyz, offsets, np.array([current]), nthreads)
+
+    def biot_savart(pos, xyz, current, dxyz, nthreads=1):
+        xyz, dxyz = np.ascontiguousarray(xyz), np.ascontiguousarray(dxyz)
+        with _threads(nthreads):
+            B = _biot_savart(pos, xyz, dxyz)
+        return B * current
+
+    def hanson_hirshman_coils(pos, xyz, offsets, currents, nthreads=1):
+        B = np.zeros((1, len(pos), 3))
+        with _threads(nthreads):
+            _hanson_hirshman(pos, np.ascontiguousarray(xyz), offsets, currents, B)
+        return B[0]
+
+    def hanson_hirshman_response(pos, xyz, offsets, currents, nthreads=1):
+        resp = np.zeros((len(currents), len(pos), 3))
+        with _threads(nthreads):
+            _hanson_hirshman(pos, np.ascontiguousarray(xyz), offsets, currents, resp)
+        return resp
+
+    def vector_potential_coils(pos, xyz, offsets, currents, nthreads=1):
+        with _threads(nthreads):
+            return _vector_potential(pos, np.ascontiguousarray(xyz), offsets, currents)
+
+    return {
+        "hanson_hirshman": hanson_hirshman,
+        "biot_savart": biot_savart,
+        "hanson_hirshman_coils": hanson_hirshman_coils,
+        "hanson_hirshman_response": hanson_hirshman_response,
+        "vector_potential_coils": vector_potential_coils,
+    }
+
+
+_BACKEND_LOADERS = {
+    "numpy": _numpy_backend,
+    "fortran": _fortran_backend,
+    "numba": _numba_backend,
+}
+
+
+def _load_backend(name):
+    if name not in _BACKEND_LOADERS:
+        raise ValueError(
+            "Unknown backend {:}, choose from {:}.".format(name, list(_BACKEND_LOADERS))
+        )
+    if name not in _backends:
+        kernels = dict(_BACKEND_LOADERS[name]())
+        kernels["name"] = name
+        _backends[name] = kernels
+    return _backends[name]
+
+
+def available_backends():
+    """Names of the Biot-Savart backends that can be loaded, fastest first.
+
+    Returns:
+        list: Subset of ["fortran", "numba", "numpy"].
+    """
+    names = []
+    for name in _BACKEND_ORDER:
+        try:
+            _load_backend(name)
+        except Exception:
+            # not installed, or failing to load (e.g. a binary mismatch)
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name=None):
+    """Kernels of a Biot-Savart backend.
+
+    Args:
+        name (str, optional): "numpy", "fortran", "numba" or "auto". Defaults to None,
+            using the backend chosen by `set_backend` (or the environment variable
+            `COILPY_BACKEND`), otherwise the fastest available one.
+
+    Returns:
+        dict: Kernels "hanson_hirshman", "biot_savart", "hanson_hirshman_coils",
+            "hanson_hirshman_response", "vector_potential_coils" and the backend "name".
+    """
+    global _backend
+    if name is None:
+        if _backend is None:
+            set_backend(os.environ.get("COILPY_BACKEND", "auto"))
+        name = _backend
+    if name == "auto":
+        name = available_backends()[0]
+    return _load_backend(name)
+
+
+def set_backend(name="auto", check=False):
+    """Select the Biot-Savart backend used by default.
+
+    Args:
+        name (str, optional): "numpy", "fortran", "numba" or "auto" (the fastest
+            available one). Defaults to "auto".
+        check (bool, optional): Compare the backends with `check_backends` first and
+            skip those that disagree with NumPy. Defaults to False.
+
+    Returns:
+        str: Name of the selected backend.
+    """
+    global _backend
+    if name == "auto":
+        names = available_backends()
+        if check:
+            errors = check_backends()
+            names = [n for n in names if errors[n] is not None and errors[n] < 1e-10]
+        name = names[0]
+    else:
+        _load_backend(name)
+        if check:
+            errors = check_backends([name])
+            if errors[name] is None or errors[name] >= 1e-10:
+                raise ValueError("Backend {:} fails the self-check.".format(name))
+    _backend = name
+    return name
+
+
+def check_backends(names=None, npos=16, nseg=64):
+    """Self-check of the backends against the NumPy kernels on a random coil set.
+
+    Args:
+        names (list, optional): Backends to check. Defaults to None, all available ones.
+        npos (int, optional): Number of evaluation points. Defaults to 16.
+        nseg (int, optional): Number of segments per coil. Defaults to 64.
+
+    Returns:
+        dict: Maximum relative deviation of every backend from NumPy, None if the
+            backend raises an error.
+    """
+    if names is None:
+        names = available_backends()
+    rng = np.random.default_rng(0)
+    t = np.linspace(0, 2 * np.pi, nseg + 1)
+    xyz, offsets = [], [0]
+    for R in (1.0, 1.5):
+        coil = np.transpose([R * np.cos(t), R * np.sin(t), 0.1 * np.sin(3 * t)])
+        xyz.append(coil)
+        offsets.append(offsets[-1] + len(coil))
+    xyz = np.concatenate(xyz)
+    offsets = np.array(offsets, dtype=np.int32)
+    currents = np.array([1.0e6, -2.0e5])
+    dxyz = np.diff(xyz[: offsets[1]], axis=0)
+    pos = rng.uniform(-0.5, 0.5, (npos, 3)) + [1.2, 0, 0]
+
+    def evaluate(kernels):
+        return np.concatenate(
+            [
+                kernels["hanson_hirshman"](pos, xyz[: offsets[1]], currents[0]),
+                kernels["biot_savart"](pos, xyz[: offsets[1] - 1], currents[0], dxyz),
+                kernels["hanson_hirshman_coils"](pos, xyz, offsets, currents),
+                kernels["hanson_hirshman_response"](
+                    pos, xyz, offsets, currents
+                ).reshape((-1, 3)),
+                kernels["vector_potential_coils"](pos, xyz, offsets, currents),
+            ]
+        )
+
+    ref = evaluate(_load_backend("numpy"))
+    errors = {}
+    for name in names:
+        try:
+            B = evaluate(_load_backend(name))
+        except Exception:
+            errors[name] = None
+            continue
+        errors[name] = np.max(np.abs(B - ref)) / np.max(np.abs(ref))
+    return errors
+
+
+def vector_potential_coils(pos, xyz, offsets, currents, nthreads=1, backend=None):
+    """Vector potential of a coil set in one call, each coil made of straight segments.
+
+    Args:
+        pos (ndarray, (n,3)): Evaluation points.
+        xyz (ndarray, (npts,3)): Points of all coils, concatenated.
+        offsets (ndarray, (ncoil+1,)): Offset table, coil i is `xyz[offsets[i]:offsets[i+1]]`.
+        currents (ndarray, (ncoil,)): Coil currents.
+        nthreads (int, optional): Number of threads. Defaults to 1.
+        backend (str, optional): Backend name. Defaults to None (see `get_backend`).
+
+    Returns:
+        ndarray, (n,3): Vector potential at the evaluation points.
+    """
+    pos = np.atleast_2d(np.asarray(pos, dtype=float))
+    xyz = np.asarray(xyz, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int32)
+    currents = np.asarray(currents, dtype=float)
+    kernel = get_backend(backend)["vector_potential_coils"]
+    return kernel(pos, xyz, offsets, currents, nthreads=nthreads)
+
+
+def _threaded(kernel, pos, nthreads, *args):
+    """Split the evaluation points of a NumPy kernel across a pool of threads."""
+    if nthreads <= 1 or len(pos) < 2:
+        return kernel(pos, *args)
+    from concurrent.futures import ThreadPoolExecutor
+
+    blocks = np.array_split(pos, min(nthreads, len(pos)))
+    with ThreadPoolExecutor(max_workers=nthreads) as pool:
+        results = list(pool.map(lambda block: kernel(block, *args), blocks))
+    if isinstance(results[0], tuple):
+        return tuple(np.concatenate(res) for res in zip(*results))
+    return np.concatenate(results)
+
+
+def _blocks(kernel, pos, chunk=None):
+    """Evaluate a kernel on blocks of `chunk` points (all at once if None)."""
+    if chunk is None or len(pos) <= chunk:
+        return kernel(pos)
+    return np.concatenate(
+        [kernel(pos[start : start + chunk]) for start in range(0, len(pos), chunk)]
+    )
+
+
+def _chunk_size(nseg, chunk=None, buffer_size=2 ** 20):
+    """Number of points per block so that (chunk, nseg) scratch arrays stay bounded."""
+    if chunk is None:
+        chunk = buffer_size // max(nseg, 1)
+    return max(int(chunk), 1)
+
+
+def _packed_segments(xyz, offsets):
+    """Split packed coil points into straight segments.
+
+    Args:
+        xyz (ndarray, (npts,3)): Points of all coils, concatenated.
+        offsets (ndarray, (ncoil+1,)): Offset table, coil i is `xyz[offsets[i]:offsets[i+1]]`.
+
+    Returns:
+        ndarray, (nseg,3): Starting points of the segments.
+        ndarray, (nseg,3): Ending points of the segments.
+        ndarray, (nseg,): Coil index of each segment.
+    """
+    offsets = np.asarray(offsets)
+    # the last point of each coil does not start a segment
+    start = np.ones(len(xyz), dtype=bool)
+    start[offsets[1:] - 1] = False
+    index = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets) - 1)
+    return xyz[start], xyz[np.roll(start, 1)], index
+
+
+def _biot_savart_segments(pos, xyz, dl, current, chunk=None):
+    """Biot-Savart law summed over a packed array of segments (NumPy kernel).
+
+    Args:
+        pos (ndarray, (n,3)): Evaluation points.
+        xyz (ndarray, (nseg,3)): Segment positions.
+        dl (ndarray, (nseg,3)): Segment tangents multiplied by the segment length.
+        current (float or ndarray, (nseg,)): Current carried by each segment.
+        chunk (int, optional): Points per block. Defaults to None (automatic).
+
+    Returns:
+        ndarray, (n,3): Magnetic field at the evaluation points.
+    """
+    pos = np.atleast_2d(pos)
+    dl = dl * np.reshape(current, (-1, 1))
+    chunk = _chunk_size(len(xyz), chunk)
+    B = np.zeros((len(pos), 3))
+    for start in range(0, len(pos), chunk):
+        p = pos[start : start + chunk]
+        dx = p[:, 0:1] - xyz[:, 0]
+        dy = p[:, 1:2] - xyz[:, 1]
+        dz = p[:, 2:3] - xyz[:, 2]
+        rm3 = np.power(dx * dx + dy * dy + dz * dz, -1.5)
+        B[start : start + chunk, 0] = np.sum((dz * dl[:, 1] - dy * dl[:, 2]) * rm3, 1)
+        B[start : start + chunk, 1] = np.sum((dx * dl[:, 2] - dz * dl[:, 0]) * rm3, 1)
+        B[start : start + chunk, 2] = np.sum((dy * dl[:, 0] - dx * dl[:, 1]) * rm3, 1)
+    return B * 1.0e-7
+
+
+def _hanson_hirshman_segments(pos, ri, rf, current, chunk=None, gradient=False):
+    """Hanson-Hirshman expression summed over a packed array of segments (NumPy kernel).
+
+    Args:
+        pos (ndarray, (n,3)): Evaluation points.
+        ri (ndarray, (nseg,3)): Starting points of the straight segments.
+        rf (ndarray, (nseg,3)): Ending points of the straight segments.
+        current (float or ndarray, (nseg,)): Current carried by each segment.
+        chunk (int, optional): Points per block. Defaults to None (automatic).
+        gradient (bool, optional): Also return the field gradient. Defaults to False.
+
+    Returns:
+        ndarray, (n,3): Magnetic field at the evaluation points.
+        ndarray, (n,3,3): Gradient dB_i/dx_j, only if `gradient` is True.
+    """
+    pos = np.atleast_2d(pos)
+    lv = rf - ri
+    current = np.broadcast_to(current, (len(ri),))
+    chunk = _chunk_size(len(ri), chunk)
+    B = np.zeros((len(pos), 3))
+    if gradient:
+        dB = np.zeros((len(pos), 3, 3))
+    for start in range(0, len(pos), chunk):
+        end = start + chunk
+        p = pos[start:end]
+        rix = p[:, 0:1] - ri[:, 0]
+        riy = p[:, 1:2] - ri[:, 1]
+        riz = p[:, 2:3] - ri[:, 2]
+        rfx = p[:, 0:1] - rf[:, 0]
+        rfy = p[:, 1:2] - rf[:, 1]
+        rfz = p[:, 2:3] - rf[:, 2]
+        Ri = np.sqrt(rix * rix + riy * riy + riz * riz)
+        Rf = np.sqrt(rfx * rfx + rfy * rfy + rfz * rfz)
+        RiRf = Ri * Rf
+        s = rix * rfx + riy * rfy + riz * rfz
+        D = RiRf * (RiRf + s)
+        fac = current * (Ri + Rf) / D
+        # Ri x Rf = l x Ri
+        cx = lv[:, 1] * riz - lv[:, 2] * riy
+        cy = lv[:, 2] * rix - lv[:, 0] * riz
+        cz = lv[:, 0] * riy - lv[:, 1] * rix
+        B[start:end, 0] = np.sum(cx * fac, 1)
+        B[start:end, 1] = np.sum(cy * fac, 1)
+        B[start:end, 2] = np.sum(cz * fac, 1)
+        if not gradient:
+            continue
+        # d(l x Ri)/dx_j = l x e_j
+        L = np.matmul(fac, lv)
+        dB[start:end, 0, 1] = -L[:, 2]
+        dB[start:end, 0, 2] = L[:, 1]
+        dB[start:end, 1, 0] = L[:, 2]
+        dB[start:end, 1, 2] = -L[:, 0]
+        dB[start:end, 2, 0] = -L[:, 1]
+        dB[start:end, 2, 1] = L[:, 0]
+        # d(fac)/dx_j, reusing Ri, Rf, s and D
+        dP = 2 * RiRf + s
+        for j, (a, b) in enumerate(((rix, rfx), (riy, rfy), (riz, rfz))):
+            a_Ri, b_Rf = a / Ri, b / Rf
+            dD = (Rf * a_Ri + Ri * b_Rf) * dP + RiRf * (a + b)
+            dfac = (current * (a_Ri + b_Rf) - fac * dD) / D
+            dB[start:end, 0, j] += np.sum(cx * dfac, 1)
+            dB[start:end, 1, j] += np.sum(cy * dfac, 1)
+            dB[start:end, 2, j] += np.sum(cz * dfac, 1)
+    if gradient:
+        return B * 1.0e-7, dB * 1.0e-7
+    return B * 1.0e-7
+
+
+def _vector_potential_segments(pos, ri, rf, current, chunk=None):
+    """Vector potential of a packed array of straight segments (NumPy kernel).
+
+    A = mu0/4pi * I * l/|l| * log((Ri + Rf + |l|)/(Ri + Rf - |l|)), using the same
+    segment geometry as the Hanson-Hirshman expression.
+
+    Args:
+        pos (ndarray, (n,3)): Evaluation points.
+        ri (ndarray, (nseg,3)): Starting points of the straight segments.
+        rf (ndarray, (nseg,3)): Ending points of the straight segments.
+        current (float or ndarray, (nseg,)): Current carried by each segment.
+        chunk (int, optional): Points per block. Defaults to None (automatic).
+
+    Returns:
+        ndarray, (n,3): Vector potential at the evaluation points.
+    """
+    pos = np.atleast_2d(pos)
+    lv = rf - ri
+    ll = np.linalg.norm(lv, axis=1)
+    # zero-length segments (repeated points) do not contribute
+    keep = ll > 0
+    current = np.broadcast_to(current, ll.shape)[keep]
+    ri, rf, lv, ll = ri[keep], rf[keep], lv[keep], ll[keep]
+    lv = lv * np.reshape(current / ll, (-1, 1))
+    chunk = _chunk_size(len(ri), chunk)
+    A = np.zeros((len(pos), 3))
+    for start in range(0, len(pos), chunk):
+        p = pos[start : start + chunk]
+        Ri = np.sqrt(
+            (p[:, 0:1] - ri[:, 0]) ** 2
+            + (p[:, 1:2] - ri[:, 1]) ** 2
+            + (p[:, 2:3] - ri[:, 2]) ** 2
+        )
+        Rf = np.sqrt(
+            (p[:, 0:1] - rf[:, 0]) ** 2
+            + (p[:, 1:2] - rf[:, 1]) ** 2
+            + (p[:, 2:3] - rf[:, 2]) ** 2
+        )
+        RR = Ri + Rf
+        A[start : start + chunk] = np.matmul(np.log((RR + ll) / (RR - ll)), lv)
+    return A * 1.0e-7
 
 
 def rotation_matrix(alpha=0.0, beta=0.0, gamma=0.0):
@@ -743,3 +1383,76 @@ def rotation_matrix(alpha=0.0, beta=0.0, gamma=0.0):
             [-sb, cb * sc, cb * cc],
         ]
     )
+
+
+def _open_text(filename, mode="w"):
+    """Open a text file, gzipped if the name ends with ".gz"; file objects are passed through."""
+    import contextlib
+    import gzip
+
+    if not isinstance(filename, (str, os.PathLike)):
+        return contextlib.nullcontext(filename)
+    if str(filename).endswith(".gz"):
+        return gzip.open(filename, mode + "t")
+    return open(filename, mode)
+
+
+def _write_table(wfile, fmt, table, chunk=8192):
+    """Write the rows of a 2D array with one printf-style line format, block by block.
+
+    Args:
+        wfile (file): Text file object.
+        fmt (str): Format of one row, e.g. "%15.7E %15.7E\\n".
+        table (array_like, (n,m)): Rows to be written.
+        chunk (int, optional): Rows formatted at once. Defaults to 8192.
+    """
+    table = np.asarray(table, dtype=float)
+    for start in range(0, len(table), chunk):
+        rows = table[start : start + chunk]
+        wfile.write((fmt * len(rows)) % tuple(rows.ravel().tolist()))
+    return
+
+
+def memmap_npz(filename):
+    """Memory-map the arrays of an uncompressed .npz file (as written by `np.savez`).
+
+    Members that are compressed or hold Python objects are read into memory instead.
+
+    Args:
+        filename (str): File name and path.
+
+    Returns:
+        dict: Arrays in the file, numpy.memmap if possible.
+    """
+    import struct
+    import zipfile
+
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive, open(filename, "rb") as fh:
+        for info in archive.infolist():
+            key = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type == zipfile.ZIP_STORED:
+                # skip the local file header, then the .npy header
+                fh.seek(info.header_offset + 26)
+                nname, nextra = struct.unpack("<HH", fh.read(4))
+                fh.seek(info.header_offset + 30 + nname + nextra)
+                version = np.lib.format.read_magic(fh)
+                if version in [(1, 0), (2, 0)]:
+                    if version == (1, 0):
+                        header = np.lib.format.read_array_header_1_0(fh)
+                    else:
+                        header = np.lib.format.read_array_header_2_0(fh)
+                    shape, fortran_order, dtype = header
+                    if not dtype.hasobject and np.prod(shape) > 0:
+                        arrays[key] = np.memmap(
+                            filename,
+                            dtype=dtype,
+                            mode="r",
+                            offset=fh.tell(),
+                            shape=shape,
+                            order="F" if fortran_order else "C",
+                        )
+                        continue
+            with archive.open(info) as member:
+                arrays[key] = np.lib.format.read_array(member)
+    return arrays
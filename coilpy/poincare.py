@@ -0,0 +1,141 @@
+import numpy as np
+
+
+class Poincare(object):
+    """Crossings of field lines with a toroidal section.
+
+    The crossings are kept in one (nline,niter+1,2) array of (R,Z), starting with the
+    initial points; lost field lines are padded with NaN. The data can be saved and
+    loaded, and extended with more toroidal transits without recomputing the earlier
+    ones.
+    """
+
+    def __init__(self, data, source="", phi0=0.0):
+        """Initialization
+
+        Args:
+            data (array_like): (R,Z) of the crossings, (nline,niter+1,2).
+            source (str, optional): Key of the field source, used to validate cached
+                data. Defaults to "".
+            phi0 (float, optional): Toroidal angle of the section. Defaults to 0.0.
+        """
+        self.data = np.asarray(data, dtype=float)
+        self.source = source
+        self.phi0 = phi0
+        return
+
+    @property
+    def nline(self):
+        return self.data.shape[0]
+
+    @property
+    def niter(self):
+        return self.data.shape[1] - 1
+
+    @property
+    def start(self):
+        return self.data[:, 0]
+
+    def save(self, filename):
+        """Save the crossings in the NumPy .npz format.
+
+        Args:
+            filename (str): File name and path, used as it is.
+        """
+        with open(filename, "wb") as f:
+            np.savez(f, data=self.data, source=np.array(self.source), phi0=self.phi0)
+        return
+
+    @classmethod
+    def load(cls, filename):
+        """Load the crossings written by `Poincare.save`.
+
+        Args:
+            filename (str): File name and path.
+
+        Returns:
+            Poincare: The crossings.
+        """
+        with np.load(filename) as f:
+            return cls(f["data"], source=str(f["source"]), phi0=float(f["phi0"]))
+
+    def matches(self, source, start, phi0=0.0):
+        """Check whether the data belongs to a field source and starting points.
+
+        Args:
+            source (str): Key of the field source.
+            start (array_like): Starting points (R,Z), (nline,2).
+            phi0 (float, optional): Toroidal angle of the section. Defaults to 0.0.
+
+        Returns:
+            bool: True if the source, section and starting points are the same.
+        """
+        start = np.asarray(start, dtype=float)
+        return (
+            source == self.source
+            and phi0 == self.phi0
+            and start.shape == self.start.shape
+            and np.array_equal(start, self.start, equal_nan=True)
+        )
+
+    def extend(self, tracer, niter):
+        """Trace more toroidal transits from the last crossings.
+
+        Args:
+            tracer (callable): tracer(rz, n) returns the (nline,n+1,2) crossings of
+                the lines starting at rz, (nline,2).
+            niter (int): Total number of transits wanted.
+
+        Returns:
+            Poincare: self, with at least `niter` transits.
+        """
+        if niter > self.niter:
+            more = tracer(self.data[:, -1], niter - self.niter)
+            self.data = np.concatenate([self.data, more[:, 1:]], axis=1)
+        return self
+
+    def plot(self, color=None, prange="full", **kwargs):
+        """Plot all the crossings with one scatter collection.
+
+        Args:
+            color (matplotlib color, or None): dot colors. Defaults to None (rainbow).
+            prange (str, optional): Plot range, one of ["upper", "lower", "full"].
+                Defaults to "full".
+            kwargs : matplotlib scatter keyword arguments
+
+        Returns:
+            matplotlib.collections.PathCollection: The scatter collection.
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib import cm
+        from matplotlib.colors import to_rgba
+
+        # get figure and ax data
+        if plt.get_fignums():
+            fig = plt.gcf()
+            ax = plt.gca()
+        else:
+            fig, ax = plt.subplots()
+
+        # one color per field line
+        if color is None:
+            colors = cm.rainbow(np.linspace(1, 0, self.nline))
+        else:
+            colors = np.tile(to_rgba(color), (self.nline, 1))
+        colors = np.repeat(colors, self.niter + 1, axis=0)
+        R = self.data[:, :, 0].ravel()
+        Z = self.data[:, :, 1].ravel()
+        # determine whether plot upper or lower
+        cond = np.isfinite(R) & np.isfinite(Z)
+        if prange == "upper":
+            cond &= Z > 0
+        elif prange == "lower":
+            cond &= Z < 0
+        kwargs["s"] = kwargs.get("s", 0.1)  # dotsize
+        dots = ax.scatter(R[cond], Z[cond], c=colors[cond], **kwargs)
+        plt.axis("equal")
+        plt.xlabel("R [m]", fontsize=20)
+        plt.ylabel("Z [m]", fontsize=20)
+        plt.xticks(fontsize=16)
+        plt.yticks(fontsize=16)
+        return dots
@@ -1,5 +1,8 @@
+import hashlib
 import numpy as np
+from collections import OrderedDict
 from .misc import read_focus_boundary, write_focus_boundary
+from .misc import _trig_tables, _trig_series
 
 
 class FourSurf(object):
@@ -9,6 +12,12 @@ class FourSurf(object):
     Z = \sum ZBC cos(mu-nv) + ZBS sin(mu-nv)
     """
 
+    # cos/sin tables of recently evaluated (theta, zeta) grids, shared by all surfaces
+    _basis_cache = OrderedDict()
+    # memory limit of the cached tables in bytes, least recently used are dropped,
+    # 0 disables the cache; see also FourSurf.clear_basis_cache
+    basis_cache_bytes = 2 ** 24
+
     def __init__(self, xm=[], xn=[], rbc=[], zbs=[], rbs=[], zbc=[]):
         """Initialization with Fourier harmonics.
 
@@ -279,42 +288,76 @@ class FourSurf(object):
         assert len(np.atleast_1d(theta)) == len(
             np.atleast_1d(zeta)
         ), "theta, zeta should be equal size"
-        # mt - nz (in matrix)
-        _mtnz = np.matmul(
-            np.reshape(self.xm, (-1, 1)), np.reshape(theta, (1, -1))
-        ) - np.matmul(np.reshape(self.xn, (-1, 1)), np.reshape(zeta, (1, -1)))
-        _cos = np.cos(_mtnz)
-        _sin = np.sin(_mtnz)
-
-        r = np.matmul(np.reshape(self.rbc, (1, -1)), _cos) + np.matmul(
-            np.reshape(self.rbs, (1, -1)), _sin
-        )
-        z = np.matmul(np.reshape(self.zbc, (1, -1)), _cos) + np.matmul(
-            np.reshape(self.zbs, (1, -1)), _sin
-        )
+        basis = self._basis(theta, zeta)
+        r = self._series(basis, self.rbc, self.rbs)
+        z = self._series(basis, self.zbc, self.zbs)
 
         if not normal:
-            return (r.ravel(), z.ravel())
+            return (r, z)
         else:
-            rt = np.matmul(np.reshape(self.xm * self.rbc, (1, -1)), -_sin) + np.matmul(
-                np.reshape(self.xm * self.rbs, (1, -1)), _cos
-            )
-            zt = np.matmul(np.reshape(self.xm * self.zbc, (1, -1)), -_sin) + np.matmul(
-                np.reshape(self.xm * self.zbs, (1, -1)), _cos
-            )
+            # derivatives of cos(mt-nz) and sin(mt-nz) in the coefficients
+            rt = self._series(basis, self.xm * self.rbs, -self.xm * self.rbc)
+            zt = self._series(basis, self.xm * self.zbs, -self.xm * self.zbc)
+            rz = self._series(basis, -self.xn * self.rbs, self.xn * self.rbc)
+            zz = self._series(basis, -self.xn * self.zbs, self.xn * self.zbc)
+            return (r, z, [rt, zt], [rz, zz])
+
+    def _basis(self, theta, zeta):
+        """cos/sin tables of (m*theta - n*zeta), cached by the modes and the points
+
+        A grid from np.meshgrid(theta, zeta, indexing="ij") is evaluated as a tensor
+        product, with cos/sin(m*theta) and cos/sin(n*zeta) of the distinct m and n.
+        Other points use the full (mn, npoints) tables.
+        """
+        theta = np.asarray(theta, dtype=float)
+        zeta = np.asarray(zeta, dtype=float)
+        tensor = (
+            theta.ndim == 2
+            and theta.shape == zeta.shape
+            and np.all(theta == theta[:, :1])
+            and np.all(zeta == zeta[:1, :])
+        )
+        if tensor:
+            theta, zeta = theta[:, 0], zeta[0]
+        key = hashlib.sha1(str((tensor, theta.shape, zeta.shape)).encode())
+        for data in (self.xm, self.xn, theta, zeta):
+            key.update(np.ascontiguousarray(data, dtype=float))
+        key = key.hexdigest()
+        cache = FourSurf._basis_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        if tensor:
+            basis = _trig_tables(theta, zeta, self.xm, self.xn)
+        else:
+            # mt - nz (in matrix)
+            _mtnz = np.matmul(
+                np.reshape(self.xm, (-1, 1)), np.reshape(theta, (1, -1))
+            ) - np.matmul(np.reshape(self.xn, (-1, 1)), np.reshape(zeta, (1, -1)))
+            basis = (np.cos(_mtnz), np.sin(_mtnz))
+        nbytes = sum(table.nbytes for table in basis)
+        if nbytes <= self.basis_cache_bytes:
+            cache[key] = basis
+            while (
+                sum(table.nbytes for item in cache.values() for table in item)
+                > self.basis_cache_bytes
+            ):
+                cache.popitem(last=False)
+        return basis
 
-            rz = np.matmul(np.reshape(-self.xn * self.rbc, (1, -1)), -_sin) + np.matmul(
-                np.reshape(-self.xn * self.rbs, (1, -1)), _cos
-            )
-            zz = np.matmul(np.reshape(-self.xn * self.zbc, (1, -1)), -_sin) + np.matmul(
-                np.reshape(-self.xn * self.zbs, (1, -1)), _cos
-            )
-            return (
-                r.ravel(),
-                z.ravel(),
-                [rt.ravel(), zt.ravel()],
-                [rz.ravel(), zz.ravel()],
-            )
+    @classmethod
+    def clear_basis_cache(cls):
+        """Drop all the cached cos/sin tables, e.g. to release the memory"""
+        FourSurf._basis_cache.clear()
+        return
+
+    @staticmethod
+    def _series(basis, fmnc, fmns):
+        """Sum of fmnc*cos(mt-nz) + fmns*sin(mt-nz) on the tables from `_basis`"""
+        if len(basis) == 2:
+            _cos, _sin = basis
+            return np.matmul(fmnc, _cos) + np.matmul(fmns, _sin)
+        return _trig_series(basis, fmnc, fmns).ravel()
 
     def xyz(self, theta, zeta, normal=False):
         """get x,y,z position of list of (theta, zeta)
@@ -346,6 +389,73 @@ class FourSurf(object):
             n = np.cross(np.transpose([_xz, _yz, _zz]), np.transpose([_xt, _yt, _zt]))
             return (r * _cos, r * _sin, z, n)
 
+    def Bn(
+        self,
+        coil,
+        npol=64,
+        ntor=64,
+        nfp=1,
+        stellsym=False,
+        half_shift=True,
+        plas_Bn=None,
+        nthreads=1,
+    ):
+        """Normal magnetic field produced by a coil set on the surface
+
+        The grid is the one of FOCUS, theta = (i+0.5)*2pi/npol and
+        zeta = (j+0.5)*2pi/ntor/nfp over one field period, in the (npol,ntor) layout
+        of `FOCUSHDF5.Bn` without the periodic row and column added by `map_matrix`.
+        Bn = B.n/|n| uses the normal of `self.xyz`, n = dr/dzeta x dr/dtheta, which
+        points outward when theta runs counterclockwise in the (R,Z) plane (e.g.
+        rbc and zbs of (m,n)=(1,0) both positive). If the FOCUS normals
+        (`FOCUSHDF5.nx`, `ny`, `nz`) point the other way, flip the sign. As in FOCUS,
+        plas_Bn is subtracted, so Bn is the residual and Bn + plas_Bn is the coil part.
+        With stellarator symmetry, Bn(-theta,-zeta) = -Bn(theta,zeta) and only half of
+        the points are evaluated.
+
+        Parameters:
+          coil -- Coil, the coil set (all field periods)
+          npol -- integer, number of poloidal discretization points (default: 64)
+          ntor -- integer, number of toroidal points in one period (default: 64)
+          nfp -- integer, number of toroidal periodicity (default: 1)
+          stellsym -- bool, if the coils and the surface are stellarator symmetric (default: False)
+          half_shift -- bool, if the grid is half-shifted as in FOCUS (default: True)
+          plas_Bn -- 2D array (npol,ntor), plasma Bn subtracted as in FOCUS (default: None)
+          nthreads -- integer, number of threads for the Biot-Savart kernel (default: 1)
+
+        Returns:
+          Bn -- 2D array (npol,ntor), normal field on the surface
+        """
+        shift = 0.5 if half_shift else 0.0
+        _theta = (np.arange(npol) + shift) * 2 * np.pi / npol
+        _zeta = (np.arange(ntor) + shift) * 2 * np.pi / ntor / nfp
+        _tv, _zv = np.meshgrid(_theta, _zeta, indexing="ij")
+        # indices of the points to be evaluated
+        index = np.arange(npol * ntor)
+        if stellsym:
+            # (-theta, -zeta) mapped back into the grid
+            if half_shift:
+                mirror_i = npol - 1 - np.arange(npol)
+                mirror_j = ntor - 1 - np.arange(ntor)
+            else:
+                mirror_i = (npol - np.arange(npol)) % npol
+                mirror_j = (ntor - np.arange(ntor)) % ntor
+            mirror = np.ravel(mirror_i[:, np.newaxis] * ntor + mirror_j)
+            index = index[index <= mirror]
+        _x, _y, _z, _n = self.xyz(
+            np.ravel(_tv)[index], np.ravel(_zv)[index], normal=True
+        )
+        B = coil.hanson_hirshman(np.transpose([_x, _y, _z]), nthreads=nthreads)
+        Bn = np.zeros(npol * ntor)
+        Bn[index] = np.sum(B * _n, axis=1) / np.linalg.norm(_n, axis=1)
+        if stellsym:
+            other = np.setdiff1d(np.arange(npol * ntor), index)
+            Bn[other] = -Bn[mirror[other]]
+        Bn = np.reshape(Bn, (npol, ntor))
+        if plas_Bn is not None:
+            Bn -= plas_Bn
+        return Bn
+
     def _areaVolume(
         self,
         theta0=0.0,
@@ -10,10 +10,15 @@ with open("README.md", "r") as fh:
 compiler = get_default_fcompiler()
 # set some fortran compiler-dependent flags
 f90flags = []
+linkflags = []
 if compiler == "gnu95":
     f90flags.append("-ffree-line-length-none")
+    # OpenMP for the multithreaded Biot-Savart kernels
+    f90flags.append("-fopenmp")
+    linkflags.append("-lgomp")
 elif compiler == "intel" or compiler == "intelem":
-    pass
+    f90flags.append("-qopenmp")
+    linkflags.append("-liomp5")
 f90flags.append("-O3")
 
 ext = Extension(
@@ -21,7 +26,18 @@ ext = Extension(
     sources=[
         "coilpy/fortran/biotsavart.f90",
     ],
+    # wrap only the public kernels, hanson_hirshman_point is an internal helper
+    f2py_options=[
+        "only:",
+        "biot_savart",
+        "hanson_hirshman",
+        "hanson_hirshman_coils",
+        "hanson_hirshman_response",
+        "vector_potential_coils",
+        ":",
+    ],
     extra_f90_compile_args=f90flags,
+    extra_link_args=linkflags,
 )
 
 setup(
@@ -1,5 +1,21 @@
-from coilpy import Coil
+from coilpy import Coil, SymmetricCoil, available_backends
+import coilpy.misc
 import numpy as np
+import gzip
+import matplotlib.pyplot as plt
+
+
+def loop_bfield(coil, pos):
+    """Field of the coil at one point from the tangents, the original per-point form"""
+    dx = pos[0] - coil.x[:-1]
+    dy = pos[1] - coil.y[:-1]
+    dz = pos[2] - coil.z[:-1]
+    dr = dx * dx + dy * dy + dz * dz
+    Bx = (dz * coil.yt[:-1] - dy * coil.zt[:-1]) * np.power(dr, -1.5) * coil.dt
+    By = (dx * coil.zt[:-1] - dz * coil.xt[:-1]) * np.power(dr, -1.5) * coil.dt
+    Bz = (dy * coil.xt[:-1] - dx * coil.yt[:-1]) * np.power(dr, -1.5) * coil.dt
+    return np.array([np.sum(Bx), np.sum(By), np.sum(Bz)]) * 1e-7 * coil.I
+
 
 # read
 ellipse = Coil.read_makegrid("ellipse.coils")
@@ -7,6 +23,12 @@ assert ellipse.num == 16, "Coil number is read incorrectly!"
 assert len(ellipse.data[0].x) == 129, "Segment number is read incorrectly!"
 assert ellipse.data[15].I == -1e6, "Coil current is read incorrectly!"
 assert ellipse.data[10].group == 3, "Coil group is read incorrectly!"
+mapped = Coil.read_makegrid("ellipse.coils", mmap=True)
+assert np.array_equal(mapped.data[5].z, ellipse.data[5].z), "Memory-mapped read mismatch!"
+ellipse.save_npz("ellipse.npz")
+loaded = Coil.load("ellipse.npz", mmap=True)
+assert np.array_equal(loaded.data[7].y, ellipse.data[7].y), "Binary coil file mismatch!"
+assert loaded.data[7].name == ellipse.data[7].name, "Binary coil file mismatch!"
 
 # plot
 ellipse.plot(irange=range(0, 16, 4))
@@ -27,10 +49,161 @@ ellipse.toVTK(
 # calculate B field
 b = np.array([-5.85704462e-04, 2.94453517e-03, -1.63013362e-18])
 assert np.allclose(ellipse.data[0].bfield([0, 0, 0]), b)
+pos = np.random.uniform(-0.5, 0.5, (100, 3))
+bb = ellipse.data[0].bfield(pos, chunk=16)
+assert bb.shape == (100, 3), "Batched B field has a wrong shape!"
+assert np.array_equal(bb[7], ellipse.data[0].bfield(pos[7])), "Batched B field mismatch!"
+# batched evaluation is bit-identical to the loop, for any chunk size
+Bloop = np.array([loop_bfield(ellipse.data[0], p) for p in pos])
+for chunk in [1, 16, 33, 1024]:
+    bb = ellipse.data[0].bfield(pos, chunk=chunk, backend="numpy")
+    assert np.array_equal(bb, Bloop), "Batched B field mismatch!"
+bsum = np.sum([icoil.bfield_HH(pos) for icoil in ellipse.data], axis=0)
+assert np.allclose(ellipse.bfield_HH(pos), bsum), "Coil set B field mismatch!"
+bb = ellipse.data[0].hanson_hirshman(pos, nthreads=2)
+assert np.allclose(bb, ellipse.data[0].bfield_HH(pos)), "Threaded B field mismatch!"
+for backend in available_backends():
+    bb = ellipse.bfield_HH(pos, chunk=32, nthreads=2, backend=backend)
+    assert np.allclose(bb, bsum), "B field mismatch with {:} backend!".format(backend)
+    single = ellipse.data[0]
+    bb = single.bfield(pos, chunk=16, nthreads=2, backend=backend)
+    assert np.allclose(bb, single.bfield(pos, backend="numpy")), "SingleCoil backend!"
+    bb = single.bfield_HH(pos, nthreads=2, backend=backend)
+    assert np.allclose(bb, single.bfield_HH(pos, backend="numpy")), "SingleCoil backend!"
+if "numba" in available_backends():
+    import numba
+
+    # the thread count of the caller is kept
+    numba.set_num_threads(numba.config.NUMBA_NUM_THREADS)
+    ellipse.bfield_HH(pos, nthreads=1, backend="numba")
+    assert numba.get_num_threads() == numba.config.NUMBA_NUM_THREADS, "numba threads!"
+# a backend failing to load is not available
+loader, loaded = coilpy.misc._BACKEND_LOADERS["numba"], coilpy.misc._backends
+try:
+
+    def broken():
+        raise RuntimeError("compiled for another ABI")
+
+    coilpy.misc._BACKEND_LOADERS["numba"] = broken
+    coilpy.misc._backends = {}
+    assert "numba" not in available_backends(), "Broken backend is available!"
+finally:
+    coilpy.misc._BACKEND_LOADERS["numba"] = loader
+    coilpy.misc._backends = loaded
+bb, resp = ellipse.hanson_hirshman(pos, response=True)
+assert resp.shape == (16, 100, 3), "Coil response has a wrong shape!"
+assert np.allclose(bb, bsum), "Multi-coil B field mismatch!"
+bb = ellipse.bfield_response(pos, currents=2 * np.array([c.I for c in ellipse.data]))
+assert np.allclose(bb, 2 * bsum), "Response matrix B field mismatch!"
+groups = np.unique([icoil.group for icoil in ellipse.data])
+G = ellipse.response_matrix(pos, group=True)
+assert G.shape == (300, len(groups)), "Group response matrix has a wrong shape!"
+assert np.allclose(np.sum(G, axis=1).reshape(-1, 3), bsum), "Group response mismatch!"
+bb = ellipse.bfield_response(pos, currents=np.arange(1, len(groups) + 1), group=True)
+ref = [(np.searchsorted(groups, c.group) + 1) * c.bfield_HH(pos) for c in ellipse.data]
+assert np.allclose(bb, np.sum(ref, axis=0)), "Group current scaling mismatch!"
+# the cached response follows the coil geometry and currents
+moved = Coil(
+    xx=[c.x.copy() for c in ellipse.data],
+    yy=[c.y.copy() for c in ellipse.data],
+    zz=[c.z.copy() for c in ellipse.data],
+    II=[c.I for c in ellipse.data],
+    names=[c.name for c in ellipse.data],
+    groups=[c.group for c in ellipse.data],
+)
+moved.response_matrix(pos)
+moved.data[3].x += 0.1
+assert np.allclose(moved.bfield_response(pos), moved.bfield_HH(pos)), "Stale response!"
+moved.data[3].I *= -2
+assert np.allclose(moved.bfield_response(pos), moved.bfield_HH(pos)), "Stale current!"
+bb = moved.bfield_response(pos, group=True)
+assert np.allclose(bb, moved.bfield_HH(pos)), "Stale group current!"
+# tangent-based B field converges to the Hanson-Hirshman one on a fine coil
+for icoil in moved.data:
+    icoil.interpolate(num=1025)
+    icoil.fourier_tangent()
+ref = moved.bfield_HH(pos)
+tol = dict(rtol=1e-4, atol=1e-4 * np.max(np.abs(ref)))
+for backend in available_backends():
+    bb = moved.bfield(pos, backend=backend)
+    assert np.allclose(bb, ref, **tol), "Tangent B field ({:})!".format(backend)
+    for chunk in [1, 7, 64, 1000]:
+        bc = moved.bfield(pos, chunk=chunk, backend=backend)
+        assert np.allclose(bc, bb, rtol=1e-12, atol=0), "Chunked B field mismatch!"
+    single = moved.data[2]
+    bb = single.bfield(pos, backend=backend)
+    assert np.allclose(bb, single.bfield_HH(pos), **tol), "Tangent SingleCoil B field!"
+    for chunk in [1, 7, 64, 1000]:
+        bc = single.bfield(pos, chunk=chunk, backend=backend)
+        assert np.allclose(bc, bb, rtol=1e-12, atol=0), "Chunked SingleCoil B field!"
+symm = SymmetricCoil.from_coil(ellipse, nfp=2, stellsym=True)
+symm_index = [[c.x[0] for c in ellipse.data].index(c.x[0]) for c in symm.data]
+assert symm.num == 4, "Unique coils are selected incorrectly!"
+assert np.allclose(symm.bfield_HH(pos), bsum), "Symmetric B field mismatch!"
+# the symmetric images have to reproduce the coils, in any order
+order = np.random.permutation(16)
+shuffled = Coil(
+    xx=[ellipse.data[i].x for i in order],
+    yy=[ellipse.data[i].y for i in order],
+    zz=[ellipse.data[i].z for i in order],
+    II=[ellipse.data[i].I for i in order],
+    names=[ellipse.data[i].name for i in order],
+    groups=[ellipse.data[i].group for i in order],
+)
+index = [list(order).index(i) for i in symm_index]
+again = SymmetricCoil.from_coil(shuffled, nfp=2, stellsym=True, index=index)
+assert np.allclose(again.bfield_HH(pos), bsum), "Shuffled symmetric B field mismatch!"
+for index in [[0, 1, 2, 4], [1, 2, 3, 4]]:
+    try:
+        SymmetricCoil.from_coil(ellipse, nfp=2, stellsym=True, index=index)
+    except ValueError:
+        continue
+    raise AssertionError("Wrong unique coils are accepted!")
+# writing uses the full coil set
+symm.save_makegrid("test.coils")
+written = Coil.read_makegrid("test.coils")
+assert written.num == 16, "Symmetric MAKEGRID file mismatch!"
+assert np.allclose(written.bfield_HH(pos), bsum, rtol=1e-6), "Symmetric MAKEGRID file!"
+symm.plot(engine="pyplot")
+assert len(plt.gca().lines) == 16, "Symmetric coil plot mismatch!"
+bb, db = ellipse.bfield_HH(pos, gradient=True)
+fd = [
+    (ellipse.bfield_HH(pos + dx) - ellipse.bfield_HH(pos - dx)) / 2e-6
+    for dx in np.eye(3) * 1e-6
+]
+fd = np.transpose(fd, (1, 2, 0))
+assert np.allclose(db, fd, atol=1e-8), "B field gradient mismatch!"
+assert np.allclose(symm.bfield_HH(pos, gradient=True)[1], db), "Symmetric gradient mismatch!"
+# toroidal flux from the vector potential and from the surface integral of B
+t = np.linspace(0, 2 * np.pi, 128, endpoint=False)
+flux = ellipse.flux(np.transpose([3 + 0.2 * np.cos(t), 0 * t, 0.2 * np.sin(t)]))
+r = np.linspace(0, 0.2, 41)
+rr, tt = np.meshgrid(0.5 * (r[1:] + r[:-1]), t)
+pts = np.transpose([3 + rr * np.cos(tt), 0 * rr, rr * np.sin(tt)], (1, 2, 0))
+bb = ellipse.bfield_HH(pts.reshape((-1, 3)))[:, 1].reshape(rr.shape)
+assert np.isclose(flux, -np.sum(bb * rr) * r[1] * t[1], rtol=1e-3), "Flux mismatch!"
+assert np.allclose(symm.vector_potential(pos), ellipse.vector_potential(pos))
+# repeated points are zero-length segments and do not contribute
+one = ellipse.data[0]
+kwargs = dict(II=[one.I], names=[one.name], groups=[one.group])
+ref = Coil(xx=[one.x], yy=[one.y], zz=[one.z], **kwargs)
+xyz = np.transpose([one.x, one.y, one.z])
+xyz = np.concatenate([xyz[:6], xyz[5:], xyz[-1:]])
+rep = Coil(xx=[xyz[:, 0]], yy=[xyz[:, 1]], zz=[xyz[:, 2]], **kwargs)
+for backend in available_backends():
+    aa = rep.vector_potential(pos, backend=backend)
+    assert np.allclose(aa, ref.vector_potential(pos)), "Repeated point ({:})!".format(
+        backend
+    )
 
 # misc
-ellipse.data[1].interpolate()
+xyz = np.array([ellipse.data[1].x, ellipse.data[1].y, ellipse.data[1].z])
+ellipse.data[1].interpolate(num=2 * len(xyz[0]) - 1)
+assert np.allclose(ellipse.data[1].x[::2], xyz[0]), "FFT interpolation mismatch!"
 ellipse.data[1].magnify(ratio=2.0)
 
 # save
 ellipse.save_makegrid("test.coils")
+ellipse.save_makegrid("test.coils.gz")
+with gzip.open("test.coils.gz", "rt") as f, open("test.coils") as g:
+    assert f.read() == g.read(), "Gzipped MAKEGRID file mismatch!"
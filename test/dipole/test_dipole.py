@@ -0,0 +1,85 @@
+from coilpy import Dipole
+from coilpy.dipole import DipoleTree
+import numpy as np
+
+
+def loop_bfield(ox, oy, oz, mx, my, mz, pos):
+    """Field of the dipoles at one point, summed one dipole at a time"""
+    B = np.zeros(3)
+    for i in range(len(ox)):
+        r = np.array([ox[i], oy[i], oz[i]]) - pos
+        m = np.array([mx[i], my[i], mz[i]])
+        rr = np.linalg.norm(r)
+        B += 1e-7 * (3 * np.dot(m, r) / rr ** 5 * r - m / rr ** 3)
+    return B
+
+
+# dipoles on a torus shell, minor radius 0.5, some without moments
+rng = np.random.default_rng(0)
+num = 2000
+u, v = rng.uniform(0, 2 * np.pi, (2, num))
+ox = (1.0 + 0.5 * np.cos(u)) * np.cos(v)
+oy = (1.0 + 0.5 * np.cos(u)) * np.sin(v)
+oz = 0.5 * np.sin(u)
+mx, my, mz = rng.uniform(-1, 1, (3, num))
+off = rng.random(num) < 0.1
+mx[off], my[off], mz[off] = 0, 0, 0
+dipole = Dipole(ox=ox, oy=oy, oz=oz, mx=mx, my=my, mz=mz)
+# evaluation points inside the shell, minor radius < 0.3
+a, b, c = rng.uniform(0, 2 * np.pi, (3, 20))
+rho = rng.uniform(0, 0.3, 20)
+pos = np.transpose(
+    [
+        (1.0 + rho * np.cos(a)) * np.cos(b),
+        (1.0 + rho * np.cos(a)) * np.sin(b),
+        rho * np.sin(a),
+    ]
+)
+Bloop = np.array([loop_bfield(ox, oy, oz, mx, my, mz, p) for p in pos])
+Bmax = np.max(np.linalg.norm(Bloop, axis=1))
+
+# tiled evaluation against the loop, for any tile size
+for buffer_size in [1, 7, 1000, 2 ** 20]:
+    B = dipole.bfield(pos, buffer_size=buffer_size)
+    assert np.allclose(B, Bloop, rtol=0, atol=1e-12 * Bmax), "Dipole field mismatch!"
+assert np.allclose(dipole.bfield(pos[3]), Bloop[3], rtol=0, atol=1e-12 * Bmax)
+B32 = dipole.bfield(pos, dtype=np.float32, buffer_size=1000)
+assert B32.dtype == np.float32, "Single precision dtype mismatch!"
+assert np.allclose(B32, Bloop, rtol=0, atol=1e-5 * Bmax), "Single precision mismatch!"
+# dipoles without moments are skipped, even at an evaluation point
+at = np.flatnonzero(off)[0]
+onsite = np.array([ox[at], oy[at], oz[at]])
+B = dipole.bfield(onsite)
+assert np.all(np.isfinite(B)), "Zero-moment dipole not skipped!"
+Bref = loop_bfield(ox[~off], oy[~off], oz[~off], mx[~off], my[~off], mz[~off], onsite)
+assert np.allclose(B, Bref, rtol=1e-12), "Zero-moment dipole not skipped!"
+# the gradient against central differences
+B, dB = dipole.bfield(pos, gradient=True, buffer_size=1000)
+assert np.array_equal(B, dipole.bfield(pos, buffer_size=1000)), "Gradient changes B!"
+h = 1e-5
+for j in range(3):
+    dx = np.zeros(3)
+    dx[j] = h
+    fd = (dipole.bfield(pos + dx) - dipole.bfield(pos - dx)) / (2 * h)
+    dBmax = np.max(np.abs(dB))
+    assert np.allclose(dB[:, :, j], fd, rtol=0, atol=1e-6 * dBmax), "Gradient mismatch!"
+assert np.allclose(np.trace(dB, axis1=1, axis2=2), 0, atol=1e-12 * dBmax), "div(B)!"
+B, dB3 = dipole.bfield(pos[3], gradient=True)
+assert dB3.shape == (3, 3) and np.allclose(dB3, dB[3], rtol=1e-12)
+
+# octree, theta=0 sums every dipole directly
+tree = dipole.build_tree(leafsize=16)
+assert isinstance(tree, DipoleTree) and tree.num == np.sum(~off)
+B = dipole.bfield(pos)
+Btree = tree.bfield(pos, theta=0)
+assert np.allclose(Btree, B, rtol=0, atol=1e-14 * Bmax), "Octree theta=0 mismatch!"
+assert tree.error(pos, theta=0) < 1e-14, "Octree theta=0 error!"
+# the relative error is below theta**2, also with the default opening angle
+for theta in [0.1, 0.2, 0.3]:
+    Btree = tree.bfield(pos, theta=theta)
+    error = np.max(np.linalg.norm(Btree - B, axis=1)) / Bmax
+    assert error < theta ** 2, "Octree error too large!"
+    assert np.isclose(tree.error(pos, theta=theta), error, rtol=1e-6)
+error = np.max(np.linalg.norm(dipole.bfield_tree(pos) - B, axis=1)) / Bmax
+assert 0 < error < 0.2 ** 2, "Octree default error too large!"
+assert np.isclose(tree.error(pos), error, rtol=1e-6), "Octree error estimate mismatch!"
@@ -0,0 +1,198 @@
+from coilpy import Coil, SymmetricCoil, Mgrid, Poincare
+from coilpy.mgrid import _sum_groups
+import numpy as np
+import os
+import tempfile
+from scipy.interpolate import RegularGridInterpolator
+
+# a small torus: 8 circular TF coils (group 1) and 2 PF coils (group 2)
+nfp = 4
+t = np.linspace(0, 2 * np.pi, 65)
+xx, yy, zz, II, names, groups = [], [], [], [], [], []
+for k in range(8):
+    phi = (k + 0.5) * 2 * np.pi / 8
+    xx.append((1.0 + 0.5 * np.cos(t)) * np.cos(phi))
+    yy.append((1.0 + 0.5 * np.cos(t)) * np.sin(phi))
+    zz.append(0.5 * np.sin(t))
+    II.append(1e6)
+    names.append("tf")
+    groups.append(1)
+for z0 in [0.6, -0.6]:
+    xx.append(1.6 * np.cos(t))
+    yy.append(1.6 * np.sin(t))
+    zz.append(z0 * np.ones_like(t))
+    II.append(-2e5)
+    names.append("pf")
+    groups.append(2)
+coil = Coil(xx=xx, yy=yy, zz=zz, II=II, names=names, groups=groups)
+grid = (0.8, 1.2, -0.2, 0.2, 9, 7, 6)
+
+# mgrid of the coils against the Hanson-Hirshman field at some grid nodes
+mgrid = Mgrid.from_coils(coil, *grid, nfp=nfp)
+assert np.allclose(mgrid.extcur, [1e6, -2e5]), "Mgrid group currents mismatch!"
+assert mgrid.Br.shape == (9, 7, 7), "Mgrid shape mismatch!"
+for i, j, k in [(0, 0, 0), (4, 3, 2), (8, 6, 5), (2, 5, 6)]:
+    r, z, phi = mgrid.r[i], mgrid.z[j], mgrid.phi[k]
+    B = coil.bfield_HH([r * np.cos(phi), r * np.sin(phi), z])
+    Bcyl = [
+        B[0] * np.cos(phi) + B[1] * np.sin(phi),
+        B[2],
+        B[1] * np.cos(phi) - B[0] * np.sin(phi),
+    ]
+    Bgrid = [mgrid.Br[i, j, k], mgrid.Bz[i, j, k], mgrid.Bphi[i, j, k]]
+    assert np.allclose(Bgrid, Bcyl, rtol=1e-10, atol=1e-12), "Mgrid field mismatch!"
+# a symmetric coil set only evaluates its unique coils
+tf = Coil(xx=xx[:8], yy=yy[:8], zz=zz[:8], II=II[:8], names=names[:8], groups=[1] * 8)
+symm = SymmetricCoil.from_coil(tf, nfp=nfp, stellsym=True, index=[0])
+msymm = Mgrid.from_coils(symm, *grid)
+assert msymm.nfp == nfp, "SymmetricCoil nfp not used!"
+Btf = mgrid.Bgroup[0] * mgrid.extcur[0]
+Bsymm = np.array([msymm.Br, msymm.Bz, msymm.Bphi])[..., :-1]
+assert np.allclose(Bsymm, Btf, rtol=0, atol=1e-12), "Symmetric mgrid mismatch!"
+# a group whose first coil carries no current keeps the current ratios
+II0 = II[:8] + [0.0, -2e5]
+coil0 = Coil(xx=xx, yy=yy, zz=zz, II=II0, names=names, groups=groups)
+mgrid0 = Mgrid.from_coils(coil0, *grid, nfp=nfp)
+assert np.allclose(mgrid0.extcur, [1e6, -2e5]), "Mgrid group currents mismatch!"
+pf = Coil(xx=xx[9:], yy=yy[9:], zz=zz[9:], II=II[9:], names=names[9:], groups=[2])
+mpf = Mgrid.from_coils(pf, *grid, nfp=nfp)
+Bpf = mgrid0.Bgroup[1] * mgrid0.extcur[1]
+assert np.allclose(Bpf, mpf.Bgroup[0] * mpf.extcur[0], rtol=1e-12), "Zero current!"
+assert np.allclose(mgrid0.Bgroup[0], mgrid.Bgroup[0], rtol=1e-12), "Zero current!"
+
+# change the group currents
+scaled = Mgrid.from_coils(coil, *grid, nfp=nfp)
+scaled.set_extcur([2e6, 0.0])
+assert np.allclose(scaled.Br[..., :-1], 2 * Btf[0]), "set_extcur mismatch!"
+assert np.allclose(scaled.Bphi[..., -1], scaled.Bphi[..., 0]), "set_extcur mismatch!"
+
+# write and read both binary layouts
+with tempfile.TemporaryDirectory() as tmpdir:
+    for style_2000 in [True, False]:
+        filename = os.path.join(tmpdir, "mgrid_{:d}.bin".format(style_2000))
+        mgrid.write_mgrid_bin(filename, style_2000=style_2000)
+        # old-style files have no currents, they are given here
+        extcur = None if style_2000 else mgrid.extcur
+        for mmap in [False, True]:
+            read = Mgrid.read_mgrid_bin(filename, extcur=extcur, mmap=mmap)
+            assert read.nfp == nfp and read.curlabel == ["tf", "pf"]
+            assert np.array_equal(read.Bgroup[:], mgrid.Bgroup), "Mgrid read mismatch!"
+            for key in ["r", "z", "phi", "Br", "Bz", "Bphi"]:
+                assert np.allclose(getattr(read, key), getattr(mgrid, key), rtol=1e-14)
+            again = os.path.join(tmpdir, "again.bin")
+            read.write_mgrid_bin(again, style_2000=style_2000)
+            with open(filename, "rb") as f, open(again, "rb") as g:
+                assert f.read() == g.read(), "Mgrid write mismatch!"
+        read = Mgrid.read_mgrid_bin(filename, extcur=mgrid.extcur, dtype=np.float32)
+        assert read.Bgroup.dtype == np.float32
+        Bmax = np.abs(mgrid.Br).max()
+        assert np.allclose(read.Br, mgrid.Br, atol=1e-6 * Bmax), "Single precision!"
+        mapped = Mgrid.read_mgrid_bin(filename, extcur=[2e6, 0.0], mmap=True)
+        assert np.allclose(mapped.Br, scaled.Br, rtol=1e-14), "Mapped extcur mismatch!"
+        mapped.set_extcur(mgrid.extcur)
+        assert np.allclose(mapped.Bz, mgrid.Bz, rtol=1e-14), "Mapped currents mismatch!"
+        # one contraction in memory, one cross-section at a time when mapped
+        extcur = [3e5, -2e5]
+        Btot = _sum_groups(mapped.Bgroup, extcur)
+        assert np.allclose(_sum_groups(mgrid.Bgroup, extcur), Btot, rtol=1e-14)
+
+# interpolation
+
+rng = np.random.default_rng(0)
+period = 2 * np.pi / nfp
+rzp = np.array(
+    [
+        rng.uniform(0.8, 1.2, 200),
+        rng.uniform(-0.2, 0.2, 200),
+        rng.uniform(0, period, 200),
+    ]
+)
+B = mgrid.bfield(rzp)
+for i, key in enumerate(["Br", "Bz", "Bphi"]):
+    func = RegularGridInterpolator((mgrid.r, mgrid.z, mgrid.phi), getattr(mgrid, key))
+    assert np.allclose(B[i], func(rzp.T), rtol=1e-12, atol=1e-14), "Trilinear mismatch!"
+copy = rzp.copy()
+assert np.array_equal(mgrid.bfield(copy[:, 0]), B[:, :1]) and np.array_equal(copy, rzp)
+# phi is periodic, also across the boundary of the period
+shifted = rzp + [[0], [0], [3 * period]]
+assert np.allclose(mgrid.bfield(shifted), B, rtol=1e-10, atol=1e-14), "Periodic phi!"
+edge = np.array([[1.0, 1.0], [0.05, 0.05], [period - 1e-3, -1e-3]])
+assert np.allclose(*mgrid.bfield(edge).T), "Phi boundary mismatch!"
+# no field outside of the grid
+outside = np.array([[0.7, 1.3, 1.0, 1.0], [0.0, 0.0, -0.3, 0.3], [0.1, 0.1, 0.1, 0.1]])
+assert np.all(mgrid.bfield(outside) == 0), "Field outside of the grid!"
+# tricubic interpolation is exact for quadratic fields (away from the R,Z edges)
+R, Z, P = np.meshgrid(mgrid.r, mgrid.z, mgrid.phi, indexing="ij")
+quad = Mgrid(mgrid.r, mgrid.z, mgrid.phi, R ** 2, R * Z, 1 - Z ** 2, nfp=nfp)
+quad.interpolate(order=3)
+rzp[0] = rng.uniform(0.85, 1.14, 200)
+rzp[1] = rng.uniform(-0.13, 0.13, 200)
+exact = [rzp[0] ** 2, rzp[0] * rzp[1], 1 - rzp[1] ** 2]
+assert np.allclose(quad.bfield(rzp), exact, rtol=0, atol=1e-13), "Tricubic mismatch!"
+# single points, also at the edges, outside and just below phi=0
+rzp[0] = rng.uniform(0.75, 1.25, 200)
+rzp[1] = rng.uniform(-0.25, 0.25, 200)
+rzp[:, :4] = [[0.8, 1.2, 1.0, 1.0], [0.2, -0.2, 0.0, 0.0], [0.1, 0.1, -1e-17, period]]
+for order in [1, 3]:
+    mgrid.interpolate(order=order)
+    B = mgrid.bfield(rzp)
+    for i in range(rzp.shape[1]):
+        single = mgrid.bfield(rzp[:, i])
+        assert single.shape == (3, 1), "Single point shape mismatch!"
+        assert np.allclose(single[:, 0], B[:, i], rtol=1e-13, atol=1e-14), "Single!"
+mgrid.interpolate(order=1)
+
+# field-line tracing, circles around (R,Z) = (1,0)
+R, Z, P = np.meshgrid(mgrid.r, mgrid.z, mgrid.phi, indexing="ij")
+circ = Mgrid(mgrid.r, mgrid.z, mgrid.phi, -0.3 * Z, 0.3 * (R - 1), R, nfp=nfp)
+r0 = np.array([1.05, 1.1, 1.15, 1.19])
+z0 = np.array([0.0, 0.05, -0.05, 0.15])
+lines = circ.tracing(r0, z0, niter=4, nstep=16)
+assert lines.shape == (4, 5, 2) and np.array_equal(lines[:, 0], np.transpose([r0, z0]))
+for i in range(4):
+    single = circ.tracing(r0[i : i + 1], z0[i : i + 1], niter=4, nstep=16)
+    assert np.allclose(single, lines[i : i + 1], equal_nan=True), "Batched tracing!"
+radius = np.hypot(lines[:3, :, 0] - 1, lines[:3, :, 1])
+assert np.allclose(radius, radius[:, :1], rtol=1e-6), "Field lines off the circles!"
+# the last line leaves the grid
+assert np.all(np.isnan(lines[3, -1])) and not np.any(np.isnan(lines[:3])), "Lost line!"
+
+# Poincare crossings, cached in a file and extended
+with tempfile.TemporaryDirectory() as tmpdir:
+    filename = os.path.join(tmpdir, "poincare.npz")
+    first = circ.poincare(r0[:3], z0[:3], niter=5, nstep=16, filename=filename)
+    assert first.data.shape == (3, 6, 2), "Poincare shape mismatch!"
+    loaded = Poincare.load(filename)
+    assert np.array_equal(loaded.data, first.data) and loaded.source == first.source
+    assert loaded.matches(first.source, np.transpose([r0[:3], z0[:3]]), 0.0)
+    assert not loaded.matches(first.source, np.transpose([r0[:3], -z0[:3]]), 0.0)
+    assert not loaded.matches(first.source, np.transpose([r0[:2], z0[:2]]), 0.0)
+    assert not loaded.matches(first.source, np.transpose([r0[:3], z0[:3]]), 0.1)
+    assert not loaded.matches("other", np.transpose([r0[:3], z0[:3]]), 0.0)
+    # only the missing transits are traced
+    more = circ.poincare(r0[:3], z0[:3], niter=10, nstep=16, filename=filename)
+    assert np.array_equal(more.data[:, :6], first.data), "Poincare cache mismatch!"
+    full = circ.poincare(r0[:3], z0[:3], niter=10, nstep=16)
+    assert np.allclose(more.data, full.data, rtol=1e-12), "Extended Poincare mismatch!"
+    assert np.array_equal(Poincare.load(filename).data, more.data), "Cache not updated!"
+    # cached crossings are not traced again, even if they were altered
+    altered = Poincare(more.data, more.source)
+    altered.data[:, 1:] += 1e-3
+    altered.save(filename)
+    cached = circ.poincare(r0[:3], z0[:3], niter=8, nstep=16, filename=filename)
+    assert np.array_equal(cached.data, altered.data), "Poincare cache not used!"
+    # a different section is traced again
+    other = circ.poincare(
+        r0[:3], z0[:3], phi0=0.1, niter=2, nstep=16, filename=filename
+    )
+    assert other.niter == 2 and other.phi0 == 0.1, "Stale Poincare cache!"
+    # the plot traces with the given steps, it reuses the crossings of poincare
+    circ.poincare_plot(r0[:3], z0[:3], niter=10, nstep=16, filename=filename)
+    plotted = Poincare.load(filename)
+    assert plotted.source == full.source, "Poincare plot ignores nstep!"
+    assert np.allclose(plotted.data, full.data, rtol=1e-12), "Poincare plot mismatch!"
+
+if __name__ == "__main__":
+    # the worker processes are spawned and import this script again
+    parallel = circ.tracing(r0, z0, niter=4, nstep=16, nprocs=2)
+    assert np.array_equal(parallel, lines, equal_nan=True), "Parallel tracing mismatch!"
@@ -0,0 +1,130 @@
+from coilpy.misc import real2trig_2d, _fft_index, trigfft, trigfft2
+import numpy as np
+
+
+def dense_real2trig_2d(f, xm, xn, theta, zeta):
+    """The explicit cos/sin projection, f*cos(mt-nz) and f*sin(mt-nz)"""
+    mtnz = xm[:, None, None] * theta[:, None] - xn[:, None, None] * zeta
+    fac = 2.0 / f.size
+    fmnc = fac * np.sum(f * np.cos(mtnz), axis=(1, 2))
+    fmns = fac * np.sum(f * np.sin(mtnz), axis=(1, 2))
+    ind = (xm == 0) & (xn == 0)
+    fmnc[ind] *= 0.5
+    fmns[ind] *= 0.5
+    return fmnc, fmns
+
+
+def loop_trigfft(y):
+    """Cos/sin coefficients from the FFT of a 1D array, one mode at a time"""
+    N = len(y)
+    half = N // 2 - 1 if N % 2 == 0 else (N - 1) // 2
+    end = half + 2 if N % 2 == 0 else half + 1
+    comp = np.fft.fft(y) / N
+    a_k = np.zeros(end, dtype=complex)
+    b_k = np.zeros(end, dtype=complex)
+    a_k[0] = comp[0]
+    for n in range(1, half + 1):
+        a_k[n] = comp[n] + comp[N - n]
+        b_k[n] = (comp[n] - comp[N - n]) * 1j
+    if N % 2 == 0:
+        a_k[end - 1] = comp[N // 2]
+    return a_k, b_k
+
+
+def loop_trigfft2(y):
+    """Cos/sin coefficients from the FFT of a 2D array, one mode at a time"""
+    M, N = y.shape
+    end = M // 2 + 1 if M % 2 == 0 else (M + 1) // 2
+    comp = np.fft.fft2(y) / (M * N)
+    a_k = np.zeros((end, N), dtype=complex)
+    b_k = np.zeros((end, N), dtype=complex)
+    a_k[0, 0] = comp[0, 0]
+    for n in range(1, N):
+        a_k[0, n] = comp[0, n] + comp[0, N - n]
+        b_k[0, n] = (comp[0, n] - comp[0, N - n]) * 1j
+    for m in range(1, (M + 1) // 2):
+        a_k[m, 0] = comp[m, 0] + comp[M - m, 0]
+        b_k[m, 0] = (comp[m, 0] - comp[M - m, 0]) * 1j
+        for n in range(1, N):
+            a_k[m, n] = comp[m, n] + comp[M - m, N - n]
+            b_k[m, n] = (comp[m, n] - comp[M - m, N - n]) * 1j
+    if M % 2 == 0 and N % 2 == 0:
+        a_k[end - 1, N // 2] = comp[M // 2, N // 2]
+    a_k = np.fft.fftshift(a_k, axes=1)
+    b_k = np.fft.fftshift(b_k, axes=1)
+    start, mid0 = (1, N // 2) if N % 2 == 0 else (0, (N - 1) // 2)
+    a_k[0, start:mid0] = 0
+    b_k[0, start:mid0] = 0
+    return a_k, b_k
+
+
+# 2D decomposition, a field-period surface function with nfp = 3
+rng = np.random.default_rng(0)
+nfp = 3
+xm = np.repeat(np.arange(6), 9)
+xn = np.tile(np.arange(-4, 5) * nfp, 6)
+for npol, ntor in [(16, 12), (15, 11)]:
+    dt, dz = 2 * np.pi / npol, 2 * np.pi / nfp / ntor
+    for shift in [0.0, 0.5]:
+        # uniform periodic grids, the half-shifted ones also go through the FFT
+        theta = (np.arange(npol) + shift) * dt
+        zeta = (np.arange(ntor) + shift) * dz
+        assert _fft_index(theta, xm) is not None, "Uniform grid not detected!"
+        assert _fft_index(zeta, -xn) is not None, "Uniform grid not detected!"
+        f = rng.standard_normal((npol, ntor))
+        fmnc, fmns = real2trig_2d(f, xm, xn, theta, zeta)
+        cos, sin = dense_real2trig_2d(f, xm, xn, theta, zeta)
+        assert np.allclose(fmnc, cos, rtol=0, atol=1e-13), "FFT cos harmonics!"
+        assert np.allclose(fmns, sin, rtol=0, atol=1e-13), "FFT sin harmonics!"
+# a smooth function is recovered from its harmonics
+theta = (np.arange(32) + 0.5) * 2 * np.pi / 32
+zeta = np.arange(24) * 2 * np.pi / nfp / 24
+tv, zv = np.meshgrid(theta, zeta, indexing="ij")
+f = 1.0 + 0.3 * np.cos(2 * tv - nfp * zv) - 0.2 * np.sin(tv + 2 * nfp * zv)
+fmnc, fmns = real2trig_2d(f, xm, xn, theta, zeta)
+expect_c = np.where((xm == 0) & (xn == 0), 1.0, 0) + np.where(
+    (xm == 2) & (xn == nfp), 0.3, 0
+)
+expect_s = np.where((xm == 1) & (xn == -2 * nfp), -0.2, 0)
+assert np.allclose(fmnc, expect_c, rtol=0, atol=1e-14), "Cos harmonics mismatch!"
+assert np.allclose(fmns, expect_s, rtol=0, atol=1e-14), "Sin harmonics mismatch!"
+# grids with the endpoint are not periodic, they use the dense projection
+theta = np.linspace(0, 2 * np.pi, 17)
+zeta = np.linspace(0, 2 * np.pi / nfp, 13)
+assert _fft_index(theta, xm) is None and _fft_index(zeta, -xn) is None
+f = rng.standard_normal((17, 13))
+fmnc, fmns = real2trig_2d(f, xm, xn, theta, zeta)
+cos, sin = dense_real2trig_2d(f, xm, xn, theta, zeta)
+assert np.allclose(fmnc, cos, rtol=0, atol=1e-13), "Endpoint grid cos harmonics!"
+assert np.allclose(fmns, sin, rtol=0, atol=1e-13), "Endpoint grid sin harmonics!"
+
+# trigfft on a stack of arrays, against one array at a time
+keys = ["rcos", "rsin", "icos", "isin"]
+for N in [16, 15]:
+    y = rng.standard_normal((3, N)) + 1j * rng.standard_normal((3, N))
+    end = N // 2 + 1
+    stack = trigfft(y, tr=end)
+    assert stack["rcos"].shape == (3, end), "Stacked trigfft shape mismatch!"
+    for k in range(3):
+        single = trigfft(y[k], tr=end)
+        a_k, b_k = loop_trigfft(y[k])
+        loop = dict(rcos=a_k.real, rsin=b_k.real, icos=a_k.imag, isin=b_k.imag)
+        for key in keys:
+            assert np.array_equal(stack[key][k], single[key]), "Stacked trigfft!"
+            assert np.allclose(single[key], loop[key], rtol=0, atol=1e-14), "trigfft!"
+    for tr in [4, -1]:
+        truncated = trigfft(y, tr=tr)
+        assert np.array_equal(truncated["rsin"], stack["rsin"][:, :tr]), "Truncation!"
+# trigfft2 on a stack of arrays
+for M, N in [(8, 10), (7, 9), (8, 9)]:
+    y = rng.standard_normal((2, 3, M, N))
+    stack = trigfft2(y)
+    for i in range(2):
+        for k in range(3):
+            single = trigfft2(y[i, k])
+            a_k, b_k = loop_trigfft2(y[i, k])
+            loop = dict(rcos=a_k.real, rsin=b_k.real, icos=a_k.imag, isin=b_k.imag)
+            assert np.array_equal(single["n"], stack["n"]), "trigfft2 n mismatch!"
+            for key in keys:
+                assert np.array_equal(stack[key][i, k], single[key]), "trigfft2!"
+                assert np.allclose(single[key], loop[key], rtol=0, atol=1e-14)
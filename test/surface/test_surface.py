@@ -0,0 +1,89 @@
+from coilpy import FourSurf, SymmetricCoil
+import numpy as np
+
+# a rotating ellipse with nfp = 2, xn includes nfp as in FourSurf.read_focus_input
+nfp = 2
+surf = FourSurf(
+    xm=[0, 1, 1],
+    xn=[0, 0, nfp],
+    rbc=[1.0, 0.3, 0.08],
+    zbs=[0.0, 0.3, -0.08],
+    rbs=np.zeros(3),
+    zbc=np.zeros(3),
+)
+# stellarator symmetric coils, two tilted and shifted unique coils
+t = np.linspace(0, 2 * np.pi, 97)
+xx, yy, zz = [], [], []
+for phi, tilt in [(0.3, 0.2), (1.1, -0.1)]:
+    x, z = 1.0 + 0.6 * np.cos(t), 0.05 + 0.6 * np.sin(t)
+    xx.append(x * np.cos(phi) - tilt * z * np.sin(phi))
+    yy.append(x * np.sin(phi) + tilt * z * np.cos(phi))
+    zz.append(z)
+II, names, groups = [1e5, 7e4], ["a", "b"], [1, 2]
+symm = SymmetricCoil(xx, yy, zz, II, names, groups, nfp=nfp, stellsym=True)
+coil = symm.full()
+
+# normal field on the FOCUS grid
+npol, ntor = 12, 10
+Bn = surf.Bn(coil, npol=npol, ntor=ntor, nfp=nfp)
+assert Bn.shape == (npol, ntor), "Bn shape mismatch!"
+for i, j in [(0, 0), (5, 3), (11, 9)]:
+    theta = (i + 0.5) * 2 * np.pi / npol
+    zeta = (j + 0.5) * 2 * np.pi / ntor / nfp
+    x, y, z, n = surf.xyz([theta], [zeta], normal=True)
+    B = coil.bfield_HH(np.transpose([x, y, z]))
+    assert np.isclose(Bn[i, j], np.sum(B * n) / np.linalg.norm(n)), "Bn mismatch!"
+# the normal points outward, the rbc and zbs of (1,0) are positive
+x, y, z, n = surf.xyz([0.0], [0.0], normal=True)
+assert n[0, 0] > 0 and abs(n[0, 1]) < 1e-14, "Normal points inward!"
+# stellarator symmetry only evaluates half of the points
+for half_shift in [True, False]:
+    full = surf.Bn(coil, npol=npol, ntor=ntor, nfp=nfp, half_shift=half_shift)
+    half = surf.Bn(
+        coil, npol=npol, ntor=ntor, nfp=nfp, half_shift=half_shift, stellsym=True
+    )
+    scale = np.max(np.abs(full))
+    assert np.allclose(half, full, rtol=0, atol=1e-12 * scale), "Stellsym Bn mismatch!"
+# plasma Bn is subtracted
+plas_Bn = np.ones((npol, ntor))
+assert np.allclose(surf.Bn(coil, npol, ntor, nfp, plas_Bn=plas_Bn), Bn - 1)
+
+# cached cos/sin tables, against evaluations without the cache
+theta = np.linspace(0, 2 * np.pi, 33)
+zeta = np.linspace(0, np.pi, 17)
+tv, zv = np.meshgrid(theta, zeta, indexing="ij")
+points = np.random.default_rng(0).uniform(0, 2 * np.pi, (2, 50))
+FourSurf.clear_basis_cache()
+for args in [(tv, zv), tuple(points)]:
+    cached = surf.rz(*args, normal=True)
+    assert len(FourSurf._basis_cache) > 0, "Basis not cached!"
+    again = surf.rz(*args, normal=True)
+    nocache = FourSurf(surf.xm, surf.xn, surf.rbc, surf.zbs, surf.rbs, surf.zbc)
+    nocache.basis_cache_bytes = 0
+    FourSurf.clear_basis_cache()
+    direct = nocache.rz(*args, normal=True)
+    assert len(FourSurf._basis_cache) == 0, "Disabled cache is used!"
+    flat = [np.concatenate([d[0], d[1], *d[2], *d[3]]) for d in (cached, again, direct)]
+    assert np.array_equal(flat[0], flat[1]), "Cached basis mismatch!"
+    assert np.allclose(flat[0], flat[2], rtol=1e-14, atol=1e-14), "Basis cache!"
+# least recently used tables are dropped above the memory limit
+nbytes = sum(table.nbytes for table in nocache._basis(tv, zv))
+limit = FourSurf.basis_cache_bytes
+try:
+    FourSurf.basis_cache_bytes = 2 * nbytes
+    FourSurf.clear_basis_cache()
+    b1, b2, b3 = [surf._basis(tv + shift, zv) for shift in [0.1, 0.2, 0.3]]
+    cache = FourSurf._basis_cache
+    assert [id(b) for b in cache.values()] == [id(b2), id(b3)], "Basis cache not LRU!"
+    assert surf._basis(tv + 0.2, zv) is b2, "Basis cache not used!"
+    assert surf._basis(tv + 0.1, zv) is not b1, "Basis cache over the limit!"
+    assert surf._basis(tv + 0.3, zv) is not b3, "Basis cache not LRU!"
+    total = sum(table.nbytes for item in cache.values() for table in item)
+    assert len(cache) == 2 and total <= 2 * nbytes, "Basis cache over the limit!"
+    # tables larger than the limit are never cached
+    FourSurf.basis_cache_bytes = nbytes - 1
+    FourSurf.clear_basis_cache()
+    surf.rz(tv, zv)
+    assert len(cache) == 0, "Basis cache over the limit!"
+finally:
+    FourSurf.basis_cache_bytes = limit